@@ -1,17 +1,108 @@
+"""List the users (or clients) of the platform realm.
+
+Users are streamed a page at a time, so auditing a realm of any size runs in constant
+memory; --count asks Keycloak for the number without listing anyone.
+
+Usage: python check_users.py [--count | --ndjson] [--search TEXT] [--email EMAIL]
+                             [--enabled true|false] [--clients] [--page-size N] [--prefetch N]
+"""
+
+import argparse
+import json
+import os
+import sys
+
 from keycloak import KeycloakAdmin
 
-try:
+from pagination import (
+    KEYCLOAK_PAGE_PREFETCH,
+    KEYCLOAK_PAGE_SIZE,
+    count_users,
+    iter_clients,
+    iter_users,
+)
+
+KEYCLOAK_URL = os.getenv('KEYCLOAK_URL', 'http://localhost:8080/')
+ADMIN_USERNAME = os.getenv('PLATFORM_ADMIN_USER', 'platform_admin')
+ADMIN_PASSWORD = os.getenv('PLATFORM_ADMIN_PASS', 'platform_secure_password_2024')
+REALM_NAME = os.getenv('PLATFORM_REALM_NAME', 'platform-engine-realm')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=f'List the users of {REALM_NAME}.')
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument('--count', action='store_true', help='Only print how many match')
+    output.add_argument('--ndjson', action='store_true', help='One JSON object per line')
+    parser.add_argument('--clients', action='store_true', help='List clients instead of users')
+    parser.add_argument('--search', help='Part of the username, email or name (or the clientId)')
+    parser.add_argument('--email', help='Users with this email')
+    parser.add_argument('--enabled', choices=('true', 'false'), help='Enabled or disabled users')
+    parser.add_argument('--page-size', type=int, default=KEYCLOAK_PAGE_SIZE)
+    parser.add_argument(
+        '--prefetch', type=int, default=KEYCLOAK_PAGE_PREFETCH, help='Pages requested ahead'
+    )
+    return parser.parse_args()
+
+
+def user_query(args):
+    query = {}
+    if args.search:
+        query['search'] = args.search
+    if args.email:
+        query['email'] = args.email
+    if args.enabled:
+        query['enabled'] = args.enabled
+    if not args.ndjson:
+        # Only the NDJSON output needs more than the brief representation
+        query['briefRepresentation'] = 'true'
+    return query
+
+
+def main():
+    args = parse_args()
     admin = KeycloakAdmin(
-        server_url='http://localhost:8080/',
-        username='platform_admin',
-        password='platform_secure_password_2024',
-        realm_name='platform-engine-realm',
+        server_url=KEYCLOAK_URL,
+        username=ADMIN_USERNAME,
+        password=ADMIN_PASSWORD,
+        realm_name=REALM_NAME,
         user_realm_name='master',
         verify=True,
+        pool_maxsize=max(args.prefetch, 1) + 1,
     )
-    users = admin.get_users()
-    print('Users in platform-engine-realm:')
-    for user in users:
-        print(f'  - {user["username"]} (enabled: {user["enabled"]})')
-except Exception as e:
-    print(f'Error: {e}')
+
+    if args.clients:
+        query = {'clientId': args.search, 'search': 'true'} if args.search else {}
+        items = iter_clients(admin, query, args.page_size, args.prefetch)
+        if args.count:
+            # Keycloak has no client count endpoint; still one page in memory at a time
+            print(sum(1 for _ in items))
+            return
+        if not args.ndjson:
+            print(f'Clients in {REALM_NAME}:')
+        for client in items:
+            if args.ndjson:
+                print(json.dumps(client))
+            else:
+                print(f'  - {client["clientId"]} (enabled: {client.get("enabled")})')
+        return
+
+    query = user_query(args)
+    if args.count:
+        query.pop('briefRepresentation')
+        print(count_users(admin, query))
+        return
+    if not args.ndjson:
+        print(f'Users in {REALM_NAME}:')
+    for user in iter_users(admin, query, args.page_size, args.prefetch):
+        if args.ndjson:
+            print(json.dumps(user))
+        else:
+            print(f'  - {user["username"]} (enabled: {user["enabled"]})')
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except Exception as e:
+        print(f'Error: {e}', file=sys.stderr)
+        sys.exit(1)
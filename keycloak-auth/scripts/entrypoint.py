@@ -2,6 +2,8 @@ import subprocess
 import sys
 import os
 
+from keycloak_config import print_timings, run_setup, timed_step
+
 def run_script(script_name):
     try:
         print(f"Starting {script_name}...")
@@ -14,17 +16,22 @@ def run_script(script_name):
 def main():
     print("=== Platform Engine Keycloak Setup ===")
     print("Setting up realm and clients for Platform Engine project...")
-    
-    run_script("keycloak_config.py")
-    run_script("keycloak_clients_config.py")
-    
-    print("✅ Platform Engine Keycloak setup completed successfully!")
-    print("Realm: platform-engine-realm")
-    print("Clients: platform-engine-web, platform-engine-api")
-    
-    # Optionally run selenium tests
-    if os.getenv("RUN_TESTS", "false").lower() == "true":
-        print("Running the selenium test...")
-        run_script("test_keycloak_config.py")
+
+    # The setup steps run in this process and share one authenticated admin session
+    timings = []
+    try:
+        run_setup(timings)
+
+        print("✅ Platform Engine Keycloak setup completed successfully!")
+        print("Realm: platform-engine-realm")
+        print("Clients: platform-engine-web, platform-engine-api")
+
+        # Optionally run selenium tests
+        if os.getenv("RUN_TESTS", "false").lower() == "true":
+            print("Running the selenium test...")
+            with timed_step(timings, "Selenium tests"):
+                run_script("test_keycloak_config.py")
+    finally:
+        print_timings(timings)
 if __name__ == "__main__":
     main()
@@ -1,8 +1,12 @@
 from keycloak import KeycloakAdmin
+from contextlib import contextmanager
 import time
 import sys
 import os
 
+from keycloak_reconcile import SPEC_FILE, load_spec, reconcile
+from readiness import NotReady, wait_for_keycloak
+
 # Keycloak server details - Use environment variables with fallbacks
 KEYCLOAK_URL = os.getenv("KEYCLOAK_URL", "http://localhost:8080/")
 TEMP_ADMIN_USERNAME = os.getenv("KEYCLOAK_ADMIN_USER", "admin")
@@ -11,7 +15,7 @@ PERM_ADMIN_USERNAME = os.getenv("PLATFORM_ADMIN_USER", "platform_admin")
 PERM_ADMIN_PASSWORD = os.getenv("PLATFORM_ADMIN_PASS", "platform_secure_password_2024")
 REALM_ADMIN_USERNAME = os.getenv("REALM_ADMIN_USER", "platform_realm_admin")
 REALM_ADMIN_PASSWORD = os.getenv("REALM_ADMIN_PASS", "platform_realm_secure_2024")
-REALM_NAME = os.getenv("PLATFORM_REALM_NAME", "platform-engine-realm")
+REALM_NAME = os.getenv("PLATFORM_REALM_NAME", "platform-engine-realm")  # also used by realm_spec.json
 
 # Configuration flags
 CREATE_PLATFORM_ADMIN = os.getenv("CREATE_PLATFORM_ADMIN", "true").lower() == "true"
@@ -20,7 +24,7 @@ KEEP_TEMP_ADMIN = os.getenv("KEEP_TEMP_ADMIN", "false").lower() == "true"
 def determine_admin_credentials():
     """
     Smart admin credential selection based on what exists.
-    Returns (username, password) for the admin that should be used.
+    Returns (username, admin) for the admin that should be used, already logged in.
     """
     # First try platform_admin if we're supposed to create one
     if CREATE_PLATFORM_ADMIN:
@@ -35,7 +39,7 @@ def determine_admin_credentials():
             # Try a simple operation to verify the admin works
             admin.get_realms()
             print(f"🔍 Found existing platform admin '{PERM_ADMIN_USERNAME}', using it.")
-            return PERM_ADMIN_USERNAME, PERM_ADMIN_PASSWORD
+            return PERM_ADMIN_USERNAME, admin
         except Exception as e:
             print(f"🔍 Platform admin '{PERM_ADMIN_USERNAME}' not accessible ({str(e)[:50]}...), trying temp admin...")
 
@@ -51,7 +55,7 @@ def determine_admin_credentials():
         # Try a simple operation to verify the admin works
         admin.get_realms()
         print(f"🔍 Using temp admin '{TEMP_ADMIN_USERNAME}' for setup.")
-        return TEMP_ADMIN_USERNAME, TEMP_ADMIN_PASSWORD
+        return TEMP_ADMIN_USERNAME, admin
     except Exception as e:
         print(f"❌ Neither platform admin nor temp admin accessible! Error: {e}")
         print("💡 Suggestions:")
@@ -61,44 +65,17 @@ def determine_admin_credentials():
         print(f"   4. If setup was completed before, platform_admin should exist")
         sys.exit(1)
 
-def wait_for_keycloak(username, password, realm="master"):
-    """Wait until Keycloak is reachable and return an authenticated KeycloakAdmin instance."""
-    for _ in range(20):  # Retry 20 times
-        try:
-            admin = KeycloakAdmin(
-                server_url=KEYCLOAK_URL,
-                username=username,
-                password=password,
-                realm_name=realm,
-                verify=True,
-            )
-            print(f"Keycloak is ready! Logged in as '{username}' on realm '{realm}'.")
-            return admin
-        except Exception as e:
-            print(f"Waiting for Keycloak to become available... Error: {e}")
-            time.sleep(10)
-    print("Keycloak did not become ready in time.", file=sys.stderr)
-    sys.exit(1)
+def connect():
+    """Wait for Keycloak and return (username, admin) for the session every step shares."""
+    try:
+        wait_for_keycloak(KEYCLOAK_URL)
+    except NotReady as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
+
+    print("🔍 Determining which admin to use...")
+    return determine_admin_credentials()
 
-def login_to_keycloak_realm(username, password, realm, userrealm):
-    """Wait until Keycloak is reachable and return an authenticated KeycloakAdmin instance."""
-    for _ in range(20):  # Retry 20 times
-        try:
-            admin = KeycloakAdmin(
-                server_url=KEYCLOAK_URL,
-                username=username,
-                password=password,
-                realm_name=realm,
-                user_realm_name=userrealm,
-                verify=True,
-            )
-            print(f"Keycloak is ready! Logged in as '{username}' on realm '{realm}'.")
-            return admin
-        except Exception as e:
-            print(f"Waiting for Keycloak to become available... Error: {e}")
-            time.sleep(10)
-    print("Keycloak did not become ready in time.", file=sys.stderr)
-    sys.exit(1)
 def create_user(userinstance, username, password, realmname):
     """Create a user on mentioned realm"""
     try:
@@ -147,35 +124,18 @@ def assign_user_role(userinstance, username, userrole):
 
 
 def check_existing_setup(admin):
-    """Check what already exists in Keycloak to avoid conflicts."""
-    setup_status = {
-        "platform_admin_exists": False,
-        "realm_exists": False,
-        "realm_admin_exists": False
-    }
-    
+    """Check whether the platform admin already exists in the master realm.
+
+    The platform realm itself is compared against realm_spec.json by the reconciler.
+    """
+    setup_status = {"platform_admin_exists": False}
+
     try:
-        # Check if platform_admin user exists
         users = admin.get_users({"username": PERM_ADMIN_USERNAME})
         setup_status["platform_admin_exists"] = len(users) > 0
-        
-        # Check if our realm exists
-        realms = admin.get_realms()
-        setup_status["realm_exists"] = any(realm["realm"] == REALM_NAME for realm in realms)
-        
-        # If realm exists, check for realm admin
-        if setup_status["realm_exists"]:
-            try:
-                realm_admin = admin
-                realm_admin.realm_name = REALM_NAME
-                realm_users = realm_admin.get_users({"username": REALM_ADMIN_USERNAME})
-                setup_status["realm_admin_exists"] = len(realm_users) > 0
-            except Exception:
-                setup_status["realm_admin_exists"] = False
-                
     except Exception as e:
         print(f"Warning: Could not check existing setup: {e}")
-    
+
     return setup_status
 
 def delete_temporary_admin(temp_admin):
@@ -192,188 +152,35 @@ def delete_temporary_admin(temp_admin):
         print(f"Error deleting temporary admin: {e}", file=sys.stderr)
         print("Continuing with setup...")
 
-def configure_keycloak(permanent_admin):
-    """Configure Keycloak with realms, clients, and admin user."""
-    try:
-        # Create Realm
-        if not any(realm["realm"] == REALM_NAME for realm in permanent_admin.get_realms()):
-            permanent_admin.create_realm({"realm": REALM_NAME, "enabled": True})
-            print(f"Realm '{REALM_NAME}' created.")
-        else:
-            print(f"Realm '{REALM_NAME}' already exists.")
-
-        # Wait for the realm to be fully available
-        time.sleep(5)  
-
-        print(f"Realm '{REALM_NAME}' created with enhanced security settings.")
-        
-        # Enable additional security features
-        permanent_admin.update_realm(
-            REALM_NAME,
-            {
-                "enabled": True,
-                "registrationAllowed": True,
-                "registrationEmailAsUsername": True,
-                "duplicateEmailsAllowed": False,
-                "loginWithEmailAllowed": True,
-                "verifyEmail": False,  # Set to True in production
-                "sslRequired": "none",  # Set to "all" in production
-                "bruteForceProtected": True,
-                "maxFailureWaitSeconds": 900,
-                "minimumQuickLoginWaitSeconds": 60,
-                "waitIncrementSeconds": 60,
-                "quickLoginCheckMilliSeconds": 1000,
-                "maxDeltaTimeSeconds": 43200,
-                "failureFactor": 30,
-            },
-        )
-        print(f"Enhanced security settings applied to realm '{REALM_NAME}'.")
-
-    except Exception as e:
-        print(f"Error configuring Keycloak: {e}", file=sys.stderr)
-        sys.exit(1)
-
-def ensure_realm_management_client(instance):
-    """Ensure the 'realm-management' client exists in the specific logged in realm."""
-    try:
-        #instance.realm_name = REALM_NAME
-        clients = instance.get_clients()
-        realm_mgmt_client = next(
-            (client for client in clients if client["clientId"] == "realm-management"), None
-        )
-
-        if not realm_mgmt_client:
-            # Realm-management client does not exist, create it
-            instance.create_client(
-                {
-                    "clientId": "realm-management",
-                    "enabled": True,
-                    "publicClient": False,
-                    "protocol": "openid-connect",
-                    "serviceAccountsEnabled": True,
-                    "directAccessGrantsEnabled": True,
-                }
-            )
-            print(f"'realm-management' client created in '{REALM_NAME}'.")
-        else:
-            print(f"'realm-management' client already exists in '{REALM_NAME}'.")
-
-    except Exception as e:
-        print(f"Error ensuring 'realm-management' client: {e}", file=sys.stderr)
-        sys.exit(1)
-
-def ensure_realm_management_roles(realm_admin):
-    """Ensure required roles exist in the realm-management client."""
-    try:
-        clients = realm_admin.get_clients()
-        realm_mgmt_client = next(
-            (client for client in clients if client["clientId"] == "realm-management"), None
-        )
-        if not realm_mgmt_client:
-            print(f"Error: 'realm-management' client not found in '{REALM_NAME}'!", file=sys.stderr)
-            sys.exit(1)
-
-        realm_mgmt_client_id = realm_mgmt_client["id"]
-        realm_roles = realm_admin.get_client_roles(realm_mgmt_client_id)
-
-        required_roles = ["realm-admin", "manage-users", "manage-clients"]
-        existing_roles = [role["name"] for role in realm_roles]
-
-        for role_name in required_roles:
-            if role_name not in existing_roles:
-                realm_admin.create_client_role(realm_mgmt_client_id, {"name": role_name})
-                print(f"Created role '{role_name}' in 'realm-management' client of '{REALM_NAME}'.")
-
-    except Exception as e:
-        print(f"Error ensuring realm management roles: {e}", file=sys.stderr)
-        sys.exit(1)
-def main():
-    print("🚀 Starting Platform Engine Keycloak Setup...")
-    
-    print(f"🔧 Configuration:")
-    print(f"   - Create Platform Admin: {CREATE_PLATFORM_ADMIN}")
-    print(f"   - Keep Temp Admin: {KEEP_TEMP_ADMIN}")
-    
-    # Step 1: Smart admin selection - use the right admin based on what exists
-    print("🔍 Determining which admin to use...")
-    admin_username, admin_password = determine_admin_credentials()
-    
-    # Step 2: Connect with the determined admin
-    admin = wait_for_keycloak(admin_username, admin_password)
-    
-    # Step 3: Check existing setup
+def ensure_platform_admin(admin):
+    """Create the permanent platform admin unless it exists; returns the setup status."""
     print("🔍 Checking existing setup...")
     setup_status = check_existing_setup(admin)
-    
+
     print(f"📊 Setup Status:")
     print(f"   - Platform Admin: {'✅ EXISTS' if setup_status['platform_admin_exists'] else '❌ MISSING'}")
-    print(f"   - Realm: {'✅ EXISTS' if setup_status['realm_exists'] else '❌ MISSING'}")
-    print(f"   - Realm Admin: {'✅ EXISTS' if setup_status['realm_admin_exists'] else '❌ MISSING'}")
-
-    # Step 4: Determine working admin for operations
-    working_admin = admin
-    if setup_status["platform_admin_exists"] and admin_username != PERM_ADMIN_USERNAME:
-        # Switch to platform admin if it exists and we're not already using it
-        try:
-            working_admin = KeycloakAdmin(
-                server_url=KEYCLOAK_URL,
-                username=PERM_ADMIN_USERNAME,
-                password=PERM_ADMIN_PASSWORD,
-                realm_name="master",
-                verify=True,
-            )
-            print(f"🔄 Switched to platform admin '{PERM_ADMIN_USERNAME}' for operations.")
-        except:
-            print(f"⚠️ Could not switch to platform admin, continuing with '{admin_username}'.")
 
-    # Step 5: Create platform admin if requested and needed
     if CREATE_PLATFORM_ADMIN and not setup_status["platform_admin_exists"]:
         print(f"📝 Creating permanent platform admin user '{PERM_ADMIN_USERNAME}'...")
-        create_user(working_admin, PERM_ADMIN_USERNAME, PERM_ADMIN_PASSWORD, "master")
+        create_user(admin, PERM_ADMIN_USERNAME, PERM_ADMIN_PASSWORD, "master")
         assign_user_role(admin, PERM_ADMIN_USERNAME, "admin")
-        working_admin = admin  # Use temp admin until we clean up
     elif CREATE_PLATFORM_ADMIN and setup_status["platform_admin_exists"]:
         print(f"✅ Platform admin '{PERM_ADMIN_USERNAME}' already exists, skipping creation.")
-        working_admin = admin
     else:
         print(f"⏭️ Skipping platform admin creation (using '{TEMP_ADMIN_USERNAME}' only).")
-        working_admin = admin
-
-    # Step 4: Configure realm if needed
-    if not setup_status["realm_exists"]:
-        print(f"🏗️ Creating realm '{REALM_NAME}'...")
-        configure_keycloak(working_admin)
-    else:
-        print(f"✅ Realm '{REALM_NAME}' already exists, skipping creation.")
-
-    # Step 5: Create realm-specific admin if needed
-    if not setup_status["realm_admin_exists"]:
-        print("👤 Creating realm-specific admin user...")
-        try:
-            # Switch context to the platform realm for user creation
-            realm_admin = working_admin
-            realm_admin.realm_name = REALM_NAME  # Switch context to platform realm
-            
-            realm_admin.create_user({
-                "username": REALM_ADMIN_USERNAME,
-                "enabled": True,
-                "email": "admin@platform-engine.local",
-                "emailVerified": True,
-                "credentials": [
-                    {"type": "password", "value": REALM_ADMIN_PASSWORD, "temporary": False}
-                ],
-            })
-            print(f"✅ Realm-specific admin user '{REALM_ADMIN_USERNAME}' created.")
-        except Exception as e:
-            print(f"⚠️ Note: Could not create realm admin user: {e}. This is optional and can be done manually.")
-    else:
-        print(f"✅ Realm admin '{REALM_ADMIN_USERNAME}' already exists, skipping creation.")
+    return setup_status
 
-    # Step 6: Ensure realm-management client exists
-    print("🔧 Ensuring realm-management client...")
-    ensure_realm_management_client(working_admin)
+def reconcile_realm(admin):
+    """Bring the realm, its clients and the realm admin in line with the spec."""
+    print(f"🏗️ Reconciling realm '{REALM_NAME}' with {os.path.basename(SPEC_FILE)}...")
+    try:
+        reconcile(admin, load_spec())
+    except Exception as e:
+        print(f"Error configuring Keycloak: {e}", file=sys.stderr)
+        sys.exit(1)
 
-    # Step 9: Clean up temporary admin if requested (only if using temp admin currently)
+def clean_up_temporary_admin(admin, admin_username, setup_status):
+    """Delete the temporary admin once the platform admin exists; returns whether it did."""
     # Check if platform admin was successfully created (either existed before or was created now)
     platform_admin_now_exists = setup_status["platform_admin_exists"] or (
         CREATE_PLATFORM_ADMIN and not setup_status["platform_admin_exists"]  # Was created this run
@@ -388,10 +195,12 @@ def main():
     
     if should_delete_temp:
         print(f"🗑️ Deleting temporary admin '{TEMP_ADMIN_USERNAME}'...")
-        delete_temporary_admin(working_admin)
+        delete_temporary_admin(admin)
         print(f"✅ Temporary admin '{TEMP_ADMIN_USERNAME}' has been deleted.")
         print("⚠️  Note: After deletion, use 'platform_admin' for future operations.")
+    return should_delete_temp
 
+def print_summary(admin_username, setup_status, should_delete_temp):
     print("\n🎉 Platform Engine Keycloak configuration complete!")
     print("=" * 60)
     
@@ -411,9 +220,49 @@ def main():
     print("\n💡 Next Steps:")
     if CREATE_PLATFORM_ADMIN and setup_status["platform_admin_exists"]:
         print(f"   - Use '{PERM_ADMIN_USERNAME}' for subsequent runs of this script")
-        print(f"   - Use '{PERM_ADMIN_USERNAME}' for keycloak_clients_config.py")
-    print(f"   - Run client configuration: python keycloak_clients_config.py")
+        print(f"   - Preview spec changes: python keycloak_reconcile.py --dry-run")
+    print(f"   - Change realm settings, clients or users in {os.path.basename(SPEC_FILE)} and re-run")
     print("=" * 60)
 
+@contextmanager
+def timed_step(timings, name):
+    """Append (name, seconds) to ``timings`` once the block is done, even if it fails."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.append((name, time.perf_counter() - started))
+
+def print_timings(timings):
+    print("⏱️ Step timings:")
+    for name, seconds in timings:
+        print(f"   - {name}: {seconds:.2f}s")
+    print(f"   - Total: {sum(seconds for _, seconds in timings):.2f}s")
+
+def run_setup(timings):
+    """Run the setup steps in-process on one admin session (one login, one connection pool)."""
+    print("🚀 Starting Platform Engine Keycloak Setup...")
+    
+    print(f"🔧 Configuration:")
+    print(f"   - Create Platform Admin: {CREATE_PLATFORM_ADMIN}")
+    print(f"   - Keep Temp Admin: {KEEP_TEMP_ADMIN}")
+
+    with timed_step(timings, "Wait for Keycloak and log in"):
+        admin_username, admin = connect()
+    with timed_step(timings, "Platform admin"):
+        setup_status = ensure_platform_admin(admin)
+    with timed_step(timings, "Realm reconciliation"):
+        reconcile_realm(admin)
+    with timed_step(timings, "Temporary admin cleanup"):
+        should_delete_temp = clean_up_temporary_admin(admin, admin_username, setup_status)
+    print_summary(admin_username, setup_status, should_delete_temp)
+
+def main():
+    timings = []
+    try:
+        run_setup(timings)
+    finally:
+        print_timings(timings)
+
 if __name__ == "__main__":
     main()
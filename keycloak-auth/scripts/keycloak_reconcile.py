@@ -0,0 +1,455 @@
+#!/usr/bin/env python3
+"""
+Declarative Keycloak Reconciler
+===============================
+
+Brings a realm to the state described in a spec file (realm_spec.json by default).
+The spec is a subset of Keycloak's RealmRepresentation: realm settings at the top level,
+plus "clients", "roles" ({"realm": [...], "client": {clientId: [...]}}) and "users"
+(with "credentials", "realmRoles" and "clientRoles"). "${VAR}" and "${VAR:-default}" in
+strings are read from the environment.
+
+Current state is read once per resource type: one partial export returns the realm
+settings, clients and roles, and each spec user is looked up by username. Only the
+differences are written, so re-running against an up-to-date realm costs a handful of
+requests. A missing realm is created with a single import of the whole spec.
+
+Changes are applied in stages (realm settings, clients, roles, users); the changes within
+a stage touch different resources and run concurrently on the shared admin session.
+
+The reconciler only adds and updates: clients, roles, users and role mappings that are
+not in the spec are left alone, and passwords are only set when a user is created.
+
+Usage: python keycloak_reconcile.py [--spec realm_spec.json] [--dry-run] [--partial-import]
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+
+from keycloak import KeycloakAdmin
+from keycloak.exceptions import KeycloakError
+
+from readiness import NotReady, wait_for_keycloak, wait_for_realm
+
+KEYCLOAK_URL = os.getenv("KEYCLOAK_URL", "http://localhost:8080/")
+SPEC_FILE = os.getenv(
+    "KEYCLOAK_SPEC_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "realm_spec.json"),
+)
+# Create missing clients, roles and users with one partialImport request instead of one each
+PARTIAL_IMPORT = os.getenv("KEYCLOAK_PARTIAL_IMPORT", "false").lower() == "true"
+# Changes of the same stage applied at once (e.g. several clients configured together)
+SETUP_CONCURRENCY = int(os.getenv("KEYCLOAK_SETUP_CONCURRENCY", "4"))
+
+CREATE_PLATFORM_ADMIN = os.getenv("CREATE_PLATFORM_ADMIN", "true").lower() == "true"
+if CREATE_PLATFORM_ADMIN:
+    ADMIN_USERNAME = os.getenv("PLATFORM_ADMIN_USER", "platform_admin")
+    ADMIN_PASSWORD = os.getenv("PLATFORM_ADMIN_PASS", "platform_secure_password_2024")
+else:
+    ADMIN_USERNAME = os.getenv("KEYCLOAK_ADMIN_USER", "admin")
+    ADMIN_PASSWORD = os.getenv("KEYCLOAK_ADMIN_PASS", "change_me")
+
+# Spec sections that are not realm settings
+RESOURCE_KEYS = ("clients", "roles", "users")
+# Order in which changes are applied; each stage may need what the previous ones created
+STAGES = ("realm", "clients", "roles", "users")
+# Plan.create kinds, by stage
+CREATE_STAGES = {
+    "clients": "clients",
+    "realm_roles": "roles",
+    "client_roles": "roles",
+    "users": "users",
+}
+# User keys that are not part of the profile compared against the server
+USER_LINK_KEYS = ("username", "credentials", "realmRoles", "clientRoles")
+# Keycloak's placeholder for secrets in exports; never a difference
+MASKED_VALUE = "**********"
+
+_ENV_PATTERN = re.compile(r"\$\{(\w+)(?::-([^}]*))?\}")
+
+
+def expand_env(value):
+    """Replace ${VAR} and ${VAR:-default} in every string of ``value``."""
+    if isinstance(value, dict):
+        return {key: expand_env(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [expand_env(item) for item in value]
+    if not isinstance(value, str):
+        return value
+
+    def substitute(match):
+        resolved = os.getenv(match.group(1), match.group(2))
+        if resolved is None:
+            raise KeyError(f"Environment variable '{match.group(1)}' used in the spec is not set")
+        return resolved
+
+    return _ENV_PATTERN.sub(substitute, value)
+
+
+def load_spec(path=SPEC_FILE):
+    with open(path) as f:
+        return expand_env(json.load(f))
+
+
+@contextmanager
+def counting_requests(admin):
+    """Count the admin REST calls made through ``admin`` while the block runs."""
+    counter = {"requests": 0}
+    lock = threading.Lock()
+    connection = admin.connection
+    for name in ("raw_get", "raw_post", "raw_put", "raw_delete"):
+        method = getattr(connection, name)
+
+        def counted(*args, _method=method, **kwargs):
+            with lock:
+                counter["requests"] += 1
+            return _method(*args, **kwargs)
+
+        setattr(connection, name, counted)
+    try:
+        yield counter
+    finally:
+        for name in ("raw_get", "raw_post", "raw_put", "raw_delete"):
+            delattr(connection, name)
+
+
+def fetch_state(admin, spec):
+    """Current realm, clients, roles and spec users, or None if the realm does not exist."""
+    admin.change_current_realm(spec["realm"])
+    try:
+        # Realm settings, clients and all roles in one request
+        export = admin.export_realm(export_clients=True, export_groups_and_role=True)
+    except KeycloakError as e:
+        if e.response_code == 404:
+            return None
+        raise
+
+    roles = export.get("roles") or {}
+    state = {
+        "realm": export,
+        "clients": {client["clientId"]: client for client in export.get("clients", [])},
+        "realm_roles": {role["name"]: role for role in roles.get("realm", [])},
+        "client_roles": {
+            client_id: {role["name"]: role for role in client_roles}
+            for client_id, client_roles in (roles.get("client") or {}).items()
+        },
+        "users": {},
+    }
+    # Realms can hold many users; only the ones in the spec are looked up
+    for user in spec.get("users", []):
+        found = admin.get_users({"username": user["username"], "exact": True})
+        if not found and user.get("email"):
+            # With registrationEmailAsUsername, Keycloak replaces the username by the email
+            found = admin.get_users({"email": user["email"], "exact": True})
+        if found:
+            mappings = admin.get_all_roles_of_user(found[0]["id"])
+            state["users"][user["username"]] = (found[0], mappings)
+    return state
+
+
+def differences(desired, current):
+    """The entries of ``desired`` whose values differ from ``current``."""
+    changed = {}
+    for key, value in desired.items():
+        existing = current.get(key)
+        if existing == MASKED_VALUE:
+            continue
+        if isinstance(value, dict) and isinstance(existing, dict):
+            if differences(value, existing):
+                changed[key] = {**existing, **value}
+        elif isinstance(value, list) and isinstance(existing, list):
+            # Keycloak does not keep the order of URI lists
+            if sorted(map(json.dumps, value)) != sorted(map(json.dumps, existing)):
+                changed[key] = value
+        elif value != existing:
+            changed[key] = value
+    return changed
+
+
+class Plan:
+    """Changes to apply by stage, plus the creations batched into a partial import."""
+
+    def __init__(self, realm, partial_import):
+        self.realm = realm
+        self.partial_import = partial_import
+        self.changes = []
+        self.imports = {"clients": [], "roles": {"realm": [], "client": {}}, "users": []}
+        self.imported = []
+
+    def add(self, stage, description, apply):
+        self.changes.append((stage, description, apply))
+
+    def create(self, kind, description, representation, apply, client_id=None):
+        """A creation, batched into the partial import when that is enabled."""
+        if not self.partial_import:
+            self.add(CREATE_STAGES[kind], description, apply)
+            return
+        if kind == "client_roles":
+            self.imports["roles"]["client"].setdefault(client_id, []).append(representation)
+        elif kind == "realm_roles":
+            self.imports["roles"]["realm"].append(representation)
+        else:
+            self.imports[kind].append(representation)
+        self.imported.append(description)
+
+    def __len__(self):
+        return len(self.changes) + len(self.imported)
+
+
+def plan_changes(admin, spec, state, partial_import=PARTIAL_IMPORT):
+    realm = spec["realm"]
+    plan = Plan(realm, partial_import)
+    if state is None:
+        plan.add(
+            "realm",
+            f"create realm '{realm}' with all its resources",
+            lambda: admin.create_realm(spec),
+        )
+        return plan
+
+    settings = {key: value for key, value in spec.items() if key not in RESOURCE_KEYS}
+    changed = differences(settings, state["realm"])
+    if changed:
+        plan.add(
+            "realm",
+            f"update realm settings: {', '.join(sorted(changed))}",
+            lambda: admin.update_realm(realm, changed),
+        )
+
+    # Internal ids of clients, filled in as new clients are created
+    client_ids = {client_id: client["id"] for client_id, client in state["clients"].items()}
+    plan_clients(admin, plan, spec, state, client_ids)
+    plan_roles(admin, plan, spec, state, client_ids)
+    plan_users(admin, plan, spec, state, client_ids)
+    return plan
+
+
+def plan_clients(admin, plan, spec, state, client_ids):
+    for client in spec.get("clients", []):
+        client_id = client["clientId"]
+        current = state["clients"].get(client_id)
+        if current is None:
+
+            def create(client=client):
+                client_ids[client["clientId"]] = admin.create_client(client)
+
+            plan.create("clients", f"create client '{client_id}'", client, create)
+            continue
+        changed = differences(client, current)
+        if changed:
+            plan.add(
+                "clients",
+                f"update client '{client_id}': {', '.join(sorted(changed))}",
+                lambda uuid=current["id"], changed=changed: admin.update_client(uuid, changed),
+            )
+
+
+def plan_roles(admin, plan, spec, state, client_ids):
+    roles = spec.get("roles") or {}
+    for role in roles.get("realm", []):
+        current = state["realm_roles"].get(role["name"])
+        if current is None:
+            plan.create(
+                "realm_roles",
+                f"create realm role '{role['name']}'",
+                role,
+                lambda role=role: admin.create_realm_role(role),
+            )
+        elif differences(role, current):
+            plan.add(
+                "roles",
+                f"update realm role '{role['name']}'",
+                lambda role=role: admin.update_realm_role(role["name"], role),
+            )
+
+    for client_id, client_roles in (roles.get("client") or {}).items():
+        existing = state["client_roles"].get(client_id, {})
+        for role in client_roles:
+            if role["name"] in existing:
+                continue
+            plan.create(
+                "client_roles",
+                f"create role '{role['name']}' of client '{client_id}'",
+                role,
+                lambda client_id=client_id, role=role: admin.create_client_role(
+                    client_ids[client_id], role
+                ),
+                client_id=client_id,
+            )
+
+
+def plan_users(admin, plan, spec, state, client_ids):
+    for user in spec.get("users", []):
+        username = user["username"]
+        if username not in state["users"]:
+            plan.create(
+                "users",
+                f"create user '{username}'",
+                user,
+                lambda user=user: create_user(admin, state, client_ids, user),
+            )
+            continue
+
+        current, mappings = state["users"][username]
+        profile = {key: value for key, value in user.items() if key not in USER_LINK_KEYS}
+        changed = differences(profile, current)
+        if changed:
+            plan.add(
+                "users",
+                f"update user '{username}': {', '.join(sorted(changed))}",
+                lambda user_id=current["id"], changed=changed: admin.update_user(user_id, changed),
+            )
+
+        granted = {role["name"] for role in mappings.get("realmMappings", [])}
+        missing = [name for name in user.get("realmRoles", []) if name not in granted]
+        if missing:
+            plan.add(
+                "users",
+                f"grant realm roles {missing} to '{username}'",
+                lambda user_id=current["id"], missing=missing: admin.assign_realm_roles(
+                    user_id, [realm_role(admin, state, name) for name in missing]
+                ),
+            )
+        client_mappings = mappings.get("clientMappings") or {}
+        for client_id, names in (user.get("clientRoles") or {}).items():
+            current_roles = client_mappings.get(client_id, {}).get("mappings", [])
+            granted = {role["name"] for role in current_roles}
+            missing = [name for name in names if name not in granted]
+            if missing:
+                plan.add(
+                    "users",
+                    f"grant roles {missing} of client '{client_id}' to '{username}'",
+                    lambda user_id=current["id"], client_id=client_id, missing=missing: (
+                        assign_client_roles(admin, state, client_ids, user_id, client_id, missing)
+                    ),
+                )
+
+
+def realm_role(admin, state, name):
+    # Roles created during this run are not in the fetched state yet
+    return state["realm_roles"].get(name) or admin.get_realm_role(name)
+
+
+def assign_client_roles(admin, state, client_ids, user_id, client_id, names):
+    # Clients created by a partial import are not in client_ids
+    uuid = client_ids.get(client_id) or admin.get_client_id(client_id)
+    known = state["client_roles"].get(client_id, {})
+    roles = [known.get(name) or admin.get_client_role(uuid, name) for name in names]
+    admin.assign_client_role(user_id, uuid, roles)
+
+
+def create_user(admin, state, client_ids, user):
+    # The users endpoint ignores role names; mappings are granted separately
+    user_id = admin.create_user(
+        {key: value for key, value in user.items() if key not in ("realmRoles", "clientRoles")}
+    )
+    if user.get("realmRoles"):
+        roles = [realm_role(admin, state, name) for name in user["realmRoles"]]
+        admin.assign_realm_roles(user_id, roles)
+    for client_id, names in (user.get("clientRoles") or {}).items():
+        assign_client_roles(admin, state, client_ids, user_id, client_id, names)
+
+
+def apply_plan(admin, plan, concurrency=SETUP_CONCURRENCY):
+    if plan.imported:
+        # Created in one request, before the grants that may need them; anything that
+        # appeared meanwhile is skipped, not overwritten
+        payload = {"ifResourceExists": "SKIP", **plan.imports}
+        result = admin.partial_import_realm(plan.realm, payload)
+        for description in plan.imported:
+            print(f"   ✅ {description} (partial import)")
+        print(
+            f"   📦 Partial import: {result.get('added', 0)} added, "
+            f"{result.get('skipped', 0)} skipped"
+        )
+    # The workers share admin's session, and so its token and connection pool
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for stage in STAGES:
+            futures = {
+                executor.submit(apply): description
+                for change_stage, description, apply in plan.changes
+                if change_stage == stage
+            }
+            for future in as_completed(futures):
+                future.result()
+                print(f"   ✅ {futures[future]}")
+
+
+def reconcile(
+    admin, spec, dry_run=False, partial_import=PARTIAL_IMPORT, concurrency=SETUP_CONCURRENCY
+):
+    """Apply the differences between ``spec`` and the realm; returns the number of changes.
+
+    ``admin`` is left on the realm it was on, so callers can share one session.
+    """
+    realm = spec["realm"]
+    previous_realm = admin.connection.realm_name
+    try:
+        with counting_requests(admin) as counter:
+            print(f"🔍 Reading current state of realm '{realm}'...")
+            state = fetch_state(admin, spec)
+            plan = plan_changes(admin, spec, state, partial_import)
+            reads = counter["requests"]
+
+            if not len(plan):
+                print(f"✅ Realm '{realm}' is up to date ({reads} requests).")
+                return 0
+            print(f"📝 {len(plan)} change(s) for realm '{realm}':")
+            if dry_run:
+                for _, description, _ in plan.changes:
+                    print(f"   - {description}")
+                for description in plan.imported:
+                    print(f"   - {description} (partial import)")
+                print("⏭️ Dry run, nothing applied.")
+                return len(plan)
+
+            apply_plan(admin, plan, concurrency)
+            if state is None:
+                # Later steps may hit the new realm right away; poll instead of sleeping
+                wait_for_realm(realm, admin.connection.server_url)
+            print(
+                f"✅ Realm '{realm}' reconciled: {len(plan)} change(s), "
+                f"{reads} reads + {counter['requests'] - reads} writes."
+            )
+            return len(plan)
+    finally:
+        admin.change_current_realm(previous_realm)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconcile a Keycloak realm with a spec file.")
+    parser.add_argument("--spec", default=SPEC_FILE, help="Realm spec (JSON)")
+    parser.add_argument("--dry-run", action="store_true", help="Print the changes only")
+    parser.add_argument(
+        "--partial-import",
+        action="store_true",
+        default=PARTIAL_IMPORT,
+        help="Create missing resources with a single partialImport request",
+    )
+    args = parser.parse_args()
+
+    try:
+        spec = load_spec(args.spec)
+        wait_for_keycloak(KEYCLOAK_URL)
+        admin = KeycloakAdmin(
+            server_url=KEYCLOAK_URL,
+            username=ADMIN_USERNAME,
+            password=ADMIN_PASSWORD,
+            realm_name="master",
+            user_realm_name="master",
+            verify=True,
+        )
+        reconcile(admin, spec, dry_run=args.dry_run, partial_import=args.partial_import)
+    except (OSError, KeyError, ValueError, KeycloakError, NotReady) as e:
+        print(f"❌ Error reconciling Keycloak: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""
+Bulk User Provisioning
+======================
+
+Creates users in the platform realm from a CSV or NDJSON file. The input is streamed, so
+tens of thousands of users never sit in memory at once.
+
+Existing usernames (a page at a time), realm roles and clients are fetched once up front;
+a client's roles the first time a user needs them. Each new user then costs one create
+plus one request per role set, spread over a bounded thread pool that shares a single
+admin session. Requests answered with 429 or 5xx are retried with jittered exponential
+backoff.
+
+Input:
+- NDJSON: one UserRepresentation per line, plus optional "password", "realmRoles" and
+  "clientRoles" ({clientId: [role, ...]}), like the users of realm_spec.json.
+- CSV: a header row with username, email, firstName, lastName, enabled, emailVerified,
+  password, realmRoles ("role;role") and clientRoles ("client:role;client:role"). Other
+  columns become user attributes.
+
+Existing users are skipped, not updated. A user whose roles cannot be assigned is deleted
+again, so that a re-run creates it with its roles; if that delete fails too, the user is
+reported as incomplete. Progress, throughput and every failure are appended to the report
+file (NDJSON) as they happen.
+
+Usage: python provision_users.py users.csv [--report report.ndjson] [--concurrency 16]
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import partial
+
+import requests
+from keycloak import KeycloakAdmin
+from keycloak.exceptions import KeycloakError
+
+from pagination import KEYCLOAK_PAGE_PREFETCH, KEYCLOAK_PAGE_SIZE, iter_pages
+from readiness import NotReady, backoff, wait_for_keycloak
+
+KEYCLOAK_URL = os.getenv("KEYCLOAK_URL", "http://localhost:8080/")
+REALM_NAME = os.getenv("PLATFORM_REALM_NAME", "platform-engine-realm")
+
+CREATE_PLATFORM_ADMIN = os.getenv("CREATE_PLATFORM_ADMIN", "true").lower() == "true"
+if CREATE_PLATFORM_ADMIN:
+    ADMIN_USERNAME = os.getenv("PLATFORM_ADMIN_USER", "platform_admin")
+    ADMIN_PASSWORD = os.getenv("PLATFORM_ADMIN_PASS", "platform_secure_password_2024")
+else:
+    ADMIN_USERNAME = os.getenv("KEYCLOAK_ADMIN_USER", "admin")
+    ADMIN_PASSWORD = os.getenv("KEYCLOAK_ADMIN_PASS", "change_me")
+
+# Users provisioned at once; also the size of the admin session's connection pool
+PROVISION_CONCURRENCY = int(os.getenv("PROVISION_CONCURRENCY", "16"))
+# Attempts per request answered with 429/5xx (or a dropped connection) before giving up
+PROVISION_MAX_ATTEMPTS = int(os.getenv("PROVISION_MAX_ATTEMPTS", "6"))
+# Write a progress line every this many users
+PROVISION_PROGRESS_EVERY = int(os.getenv("PROVISION_PROGRESS_EVERY", "1000"))
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+RETRY_INITIAL_DELAY = 0.5
+RETRY_MAX_DELAY = 15
+
+# UserRepresentation fields accepted as CSV columns; the rest become attributes
+USER_FIELDS = ("username", "email", "firstName", "lastName", "enabled", "emailVerified")
+BOOLEAN_FIELDS = ("enabled", "emailVerified")
+
+
+def read_records(path, input_format=None):
+    """Yield (line number, raw record) from a CSV or NDJSON file, one at a time."""
+    input_format = input_format or ("csv" if path.lower().endswith(".csv") else "ndjson")
+    with open(path, newline="", encoding="utf-8") as f:
+        if input_format == "csv":
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+        else:
+            for number, line in enumerate(f, start=1):
+                if line.strip():
+                    yield number, line
+
+
+def split_list(value):
+    return [item.strip() for item in (value or "").split(";") if item.strip()]
+
+
+def user_from_row(row):
+    user = {"attributes": {}}
+    for key, value in row.items():
+        if not key or value is None or not value.strip() or key in ("realmRoles", "clientRoles"):
+            continue
+        if key in BOOLEAN_FIELDS:
+            user[key] = value.strip().lower() in ("true", "1", "yes")
+        elif key in USER_FIELDS or key == "password":
+            user[key] = value.strip()
+        else:
+            user["attributes"][key] = [value]
+    if not user["attributes"]:
+        del user["attributes"]
+
+    user["realmRoles"] = split_list(row.get("realmRoles"))
+    user["clientRoles"] = {}
+    for entry in split_list(row.get("clientRoles")):
+        client_id, _, role = entry.partition(":")
+        user["clientRoles"].setdefault(client_id, []).append(role)
+    return user
+
+
+def parse_user(record):
+    user = user_from_row(record) if isinstance(record, dict) else json.loads(record)
+    if not isinstance(user, dict) or not str(user.get("username") or "").strip():
+        raise ValueError("Record has no username")
+    return user
+
+
+def representation(user):
+    """The payload for the users endpoint: roles stripped, password as a credential."""
+    payload = {
+        key: value for key, value in user.items() if key not in ("realmRoles", "clientRoles")
+    }
+    payload.setdefault("enabled", True)
+    password = payload.pop("password", None)
+    if password:
+        payload["credentials"] = [{"type": "password", "value": password, "temporary": False}]
+    return payload
+
+
+class RolesNotAssigned(Exception):
+    """A user was created but its roles could not be assigned."""
+
+    def __init__(self, user_id, error, rolled_back):
+        self.user_id = user_id
+        self.error = error
+        self.rolled_back = rolled_back
+        if rolled_back:
+            state = "the user was deleted again"
+        else:
+            state = "the user exists without its roles and is skipped by later runs"
+        super().__init__(f"Assigning roles failed ({error}); {state}")
+
+
+class Report:
+    """NDJSON report, written and flushed as events happen so a crash loses nothing."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = open(path, "w", encoding="utf-8")
+
+    def write(self, event, **fields):
+        with self.lock:
+            self.file.write(json.dumps({"event": event, "time": time.time(), **fields}) + "\n")
+            self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class Provisioner:
+    def __init__(self, admin, report, max_attempts=PROVISION_MAX_ATTEMPTS):
+        self.admin = admin
+        self.report = report
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()
+        self.counts = {"created": 0, "skipped": 0, "failed": 0, "incomplete": 0, "retries": 0}
+        self.started = time.monotonic()
+        self.existing = set()
+        self.realm_roles = {}
+        self.clients = {}
+        self.client_roles = {}
+
+    def retrying(self, attempt_call):
+        """Run ``attempt_call(attempt)``, retrying 429/5xx answers and dropped connections."""
+        delays = backoff(RETRY_INITIAL_DELAY, RETRY_MAX_DELAY)
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                return attempt_call(attempt)
+            except KeycloakError as e:
+                if e.response_code not in RETRY_STATUS_CODES or attempt == self.max_attempts:
+                    raise
+            except requests.ConnectionError:
+                if attempt == self.max_attempts:
+                    raise
+            with self.lock:
+                self.counts["retries"] += 1
+            time.sleep(next(delays))
+
+    def call(self, method, *args, **kwargs):
+        return self.retrying(lambda attempt: method(*args, **kwargs))
+
+    def prefetch(self, page_size=KEYCLOAK_PAGE_SIZE, page_prefetch=KEYCLOAK_PAGE_PREFETCH):
+        """Existing usernames, realm roles and clients, so users need no lookups."""
+        # Like iter_users, with each page retried
+        users = iter_pages(
+            partial(self.call, self.admin.get_users),
+            {"briefRepresentation": "true"},
+            page_size,
+            page_prefetch,
+        )
+        self.existing.update(user["username"] for user in users)
+        self.realm_roles = {role["name"]: role for role in self.call(self.admin.get_realm_roles)}
+        self.clients = {
+            client["clientId"]: client["id"] for client in self.call(self.admin.get_clients)
+        }
+
+    def realm_role(self, name):
+        if name not in self.realm_roles:
+            raise ValueError(f"Unknown realm role '{name}'")
+        return self.realm_roles[name]
+
+    def client_uuid(self, client_id):
+        if client_id not in self.clients:
+            raise ValueError(f"Unknown client '{client_id}'")
+        return self.clients[client_id]
+
+    def client_role(self, client_id, name):
+        client_uuid = self.client_uuid(client_id)
+        roles = self.client_roles.get(client_id)
+        if roles is None:
+            # Fetched once per client; two workers racing here just fetch it twice
+            fetched = self.call(self.admin.get_client_roles, client_uuid)
+            roles = self.client_roles[client_id] = {role["name"]: role for role in fetched}
+        if name not in roles:
+            raise ValueError(f"Unknown role '{name}' of client '{client_id}'")
+        return roles[name]
+
+    def provision(self, user):
+        """Create ``user`` with its roles; returns "created" or "skipped"."""
+        # Keycloak stores usernames in lower case
+        username = user["username"].strip().lower()
+        if username in self.existing:
+            return "skipped"
+        # Resolved before creating, so an unknown role does not leave a user without roles
+        realm_roles = [self.realm_role(name) for name in user.get("realmRoles", [])]
+        client_roles = {
+            self.client_uuid(client_id): [self.client_role(client_id, name) for name in names]
+            for client_id, names in (user.get("clientRoles") or {}).items()
+        }
+
+        payload = representation(user)
+        try:
+            # A retried create may have gone through the first time; look it up then
+            user_id = self.retrying(
+                lambda attempt: self.admin.create_user(payload, exist_ok=attempt > 1)
+            )
+        except KeycloakError as e:
+            if e.response_code == 409:
+                return "skipped"
+            raise
+        self.existing.add(username)
+
+        try:
+            if realm_roles:
+                self.call(self.admin.assign_realm_roles, user_id, realm_roles)
+            for client_uuid, roles in client_roles.items():
+                self.call(self.admin.assign_client_role, user_id, client_uuid, roles)
+        except Exception as e:
+            # Later runs skip existing users, so one left without its roles would stay so
+            raise RolesNotAssigned(user_id, e, self.roll_back(user_id, username)) from e
+        return "created"
+
+    def roll_back(self, user_id, username):
+        """Delete a user created by this run; returns whether it is gone."""
+        try:
+            self.call(self.admin.delete_user, user_id)
+        except Exception:
+            return False
+        self.existing.discard(username)
+        return True
+
+    def provision_record(self, number, record):
+        username = None
+        try:
+            user = parse_user(record)
+            username = user["username"]
+            outcome = self.provision(user)
+        except RolesNotAssigned as e:
+            outcome = "failed" if e.rolled_back else "incomplete"
+            self.report.write(
+                "failure" if e.rolled_back else "incomplete",
+                line=number,
+                username=username,
+                user_id=e.user_id,
+                rolled_back=e.rolled_back,
+                error=str(e),
+            )
+        except Exception as e:
+            outcome = "failed"
+            self.report.write("failure", line=number, username=username, error=str(e))
+
+        with self.lock:
+            self.counts[outcome] += 1
+            if self.processed % PROVISION_PROGRESS_EVERY == 0:
+                self.progress()
+
+    @property
+    def processed(self):
+        counts = self.counts
+        return counts["created"] + counts["skipped"] + counts["failed"] + counts["incomplete"]
+
+    def progress(self, event="progress"):
+        elapsed = time.monotonic() - self.started
+        rate = self.processed / elapsed if elapsed else 0.0
+        self.report.write(
+            event,
+            processed=self.processed,
+            **self.counts,
+            seconds=round(elapsed, 2),
+            users_per_second=round(rate, 1),
+        )
+        print(
+            f"📈 {self.processed} processed: {self.counts['created']} created, "
+            f"{self.counts['skipped']} skipped, {self.counts['failed']} failed, "
+            f"{self.counts['incomplete']} incomplete, {self.counts['retries']} retries "
+            f"({rate:.1f} users/s)"
+        )
+
+
+def provision_users(admin, path, report, concurrency=PROVISION_CONCURRENCY, input_format=None):
+    """Provision every user of ``path``; returns the Provisioner with the final counts."""
+    provisioner = Provisioner(admin, report)
+    print(f"🔍 Prefetching existing users, realm roles and clients of '{REALM_NAME}'...")
+    provisioner.prefetch()
+    report.write(
+        "start",
+        input=path,
+        realm=REALM_NAME,
+        concurrency=concurrency,
+        existing_users=len(provisioner.existing),
+        prefetch_seconds=round(time.monotonic() - provisioner.started, 2),
+    )
+    print(f"👥 {len(provisioner.existing)} existing users; provisioning from {path}...")
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        # Bounded, so the input is read only as fast as users are provisioned
+        pending = set()
+        for number, record in read_records(path, input_format):
+            if len(pending) >= concurrency * 2:
+                _, pending = wait(pending, return_when=FIRST_COMPLETED)
+            pending.add(executor.submit(provisioner.provision_record, number, record))
+        for future in pending:
+            future.result()
+
+    provisioner.progress("summary")
+    return provisioner
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-create users in the platform realm.")
+    parser.add_argument("input", help="Users as CSV or NDJSON")
+    parser.add_argument("--format", choices=("csv", "ndjson"), help="Default: from the extension")
+    parser.add_argument("--report", help="Report file (default: <input>.report.ndjson)")
+    parser.add_argument("--concurrency", type=int, default=PROVISION_CONCURRENCY)
+    args = parser.parse_args()
+
+    report = None
+    try:
+        wait_for_keycloak(KEYCLOAK_URL)
+        admin = KeycloakAdmin(
+            server_url=KEYCLOAK_URL,
+            username=ADMIN_USERNAME,
+            password=ADMIN_PASSWORD,
+            realm_name=REALM_NAME,
+            user_realm_name="master",
+            verify=True,
+            pool_maxsize=args.concurrency,
+        )
+        report = Report(args.report or f"{args.input}.report.ndjson")
+        provisioner = provision_users(admin, args.input, report, args.concurrency, args.format)
+    except (OSError, KeycloakError, requests.RequestException, NotReady) as e:
+        print(f"❌ Error provisioning users: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if report is not None:
+            report.close()
+
+    print(f"📄 Report: {report.path}")
+    failed, incomplete = provisioner.counts["failed"], provisioner.counts["incomplete"]
+    if failed:
+        print(f"❌ {failed} user(s) failed, see the report.", file=sys.stderr)
+    if incomplete:
+        print(
+            f"⚠️ {incomplete} user(s) were created without their roles and could not be deleted"
+            " again; grant the roles or delete them (see 'incomplete' in the report).",
+            file=sys.stderr,
+        )
+    if failed or incomplete:
+        sys.exit(1)
+    print("✅ All users provisioned.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Keycloak Readiness Probing
+==========================
+
+Polls cheap unauthenticated endpoints until Keycloak (or a realm) answers, instead of
+retrying full admin logins with a fixed sleep. Attempts are spaced with jittered
+exponential backoff, so a server that comes up a moment after the first attempt is
+noticed within a fraction of a second, and give up at an overall deadline.
+
+Usage: python readiness.py [realm]
+"""
+
+import os
+import random
+import sys
+import time
+
+import requests
+
+KEYCLOAK_URL = os.getenv("KEYCLOAK_URL", "http://localhost:8080/")
+# Endpoint that answers 200 once Keycloak is up, e.g. http://keycloak:8080/health/ready
+# with KC_HEALTH_ENABLED=true. Defaults to the master realm's OpenID discovery document,
+# which every Keycloak serves
+HEALTH_URL = os.getenv("KEYCLOAK_HEALTH_URL", "")
+# Overall seconds to wait for Keycloak or a realm before giving up
+READY_TIMEOUT = float(os.getenv("KEYCLOAK_READY_TIMEOUT", "180"))
+# First delay between attempts; doubles up to READY_MAX_DELAY
+READY_INITIAL_DELAY = float(os.getenv("KEYCLOAK_READY_INITIAL_DELAY", "0.2"))
+READY_MAX_DELAY = float(os.getenv("KEYCLOAK_READY_MAX_DELAY", "5"))
+PROBE_TIMEOUT = 5
+
+
+class NotReady(Exception):
+    pass
+
+
+def backoff(initial=READY_INITIAL_DELAY, maximum=READY_MAX_DELAY):
+    """Exponential delays, each drawn from the upper half of its window so that several
+    setup containers started together do not probe in lockstep."""
+    delay = initial
+    while True:
+        yield random.uniform(delay / 2, delay)
+        delay = min(delay * 2, maximum)
+
+
+def poll(check, description, timeout=READY_TIMEOUT):
+    """Call ``check`` until it returns without raising; returns the seconds it took.
+
+    Raises ``NotReady`` with the last error once ``timeout`` seconds have passed.
+    """
+    started = time.monotonic()
+    deadline = started + timeout
+    for attempt, delay in enumerate(backoff(), start=1):
+        try:
+            check()
+        except Exception as e:
+            error = e
+        else:
+            elapsed = time.monotonic() - started
+            print(f"✅ {description} is ready after {elapsed:.1f}s ({attempt} attempt(s)).")
+            return elapsed
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise NotReady(f"{description} did not become ready within {timeout:g}s: {error}")
+        print(f"⏳ Waiting for {description}... ({type(error).__name__})")
+        time.sleep(min(delay, remaining))
+
+
+def probe(url):
+    response = requests.get(url, timeout=PROBE_TIMEOUT)
+    response.raise_for_status()
+
+
+def discovery_url(server_url, realm):
+    return f"{server_url.rstrip('/')}/realms/{realm}/.well-known/openid-configuration"
+
+
+def wait_for_keycloak(server_url=KEYCLOAK_URL, timeout=READY_TIMEOUT):
+    """Wait until Keycloak at ``server_url`` serves requests."""
+    url = HEALTH_URL or discovery_url(server_url, "master")
+    return poll(lambda: probe(url), f"Keycloak at {server_url}", timeout)
+
+
+def wait_for_realm(realm, server_url=KEYCLOAK_URL, timeout=READY_TIMEOUT):
+    """Wait until ``realm`` serves its OpenID discovery document, e.g. after creating it."""
+    url = discovery_url(server_url, realm)
+    return poll(lambda: probe(url), f"Realm '{realm}'", timeout)
+
+
+if __name__ == "__main__":
+    try:
+        wait_for_keycloak()
+        if len(sys.argv) > 1:
+            wait_for_realm(sys.argv[1])
+    except NotReady as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
@@ -18,6 +18,8 @@ import sys
 import requests
 from keycloak import KeycloakAdmin
 
+from pagination import count_users, iter_clients
+
 # Configuration
 KEYCLOAK_URL = os.getenv("KEYCLOAK_URL", "http://localhost:8080/")
 PLATFORM_ADMIN_USERNAME = os.getenv("PLATFORM_ADMIN_USER", "platform_admin")
@@ -87,8 +89,8 @@ def test_realm_admin():
             user_realm_name=REALM_NAME,  # Realm admin exists in the target realm
             verify=True,
         )
-        users = realm_admin.get_users()
-        print(f"✅ Realm admin authenticated successfully. Found {len(users)} users in realm.")
+        user_count = count_users(realm_admin)
+        print(f"✅ Realm admin authenticated successfully. Found {user_count} users in realm.")
         return True
     except Exception as e:
         print(f"⚠️ Realm admin authentication failed: {e}")
@@ -109,14 +111,13 @@ def test_clients_exist(admin):
             verify=True,
         )
         
-        clients = realm_admin.get_clients()
-        
         required_clients = ["platform-engine-web", "platform-engine-api"]
         found_clients = []
         
-        for client in clients:
-            if client["clientId"] in required_clients:
-                found_clients.append(client["clientId"])
+        # Looked up by clientId, so the realm's other clients are never listed
+        for client_id in required_clients:
+            if any(iter_clients(realm_admin, {"clientId": client_id})):
+                found_clients.append(client_id)
         
         if len(found_clients) == len(required_clients):
             print(f"✅ All required clients found: {', '.join(found_clients)}")
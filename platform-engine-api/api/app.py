@@ -1,84 +1,238 @@
 import os
-import logging
-from logging.handlers import RotatingFileHandler
 
 from authlib.integrations.flask_oauth2 import current_token
-from flask import Flask, jsonify, render_template
+from flask import (
+    Blueprint,
+    Flask,
+    Response,
+    current_app,
+    jsonify,
+    render_template,
+    request,
+    stream_with_context,
+)
 from flask_cors import CORS
 
-from api.auth import require_auth
+from api import instrumentation
+from api.auth import require_auth, validator
+from api.database import engine_options, pool_stats
 from api.dtos import ItemDTO
-from api.models import db
-
-# Initialize the Flask app
-app = Flask(__name__)
-CORS(app)
-
-# Configure the database URI
-app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv("SQLALCHEMY_DATABASE_URI", "postgresql://user:password@db:5432/mydatabase")
-
-# Initialize the database
-db.init_app(app)
-
-with app.app_context():
-    db.create_all()
-
-# Configure logging
-def configure_logging():
-    # Set the logging level
-    app.logger.setLevel(logging.DEBUG)
-
-    # Create a console handler
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(logging.DEBUG)
-
-    # Create a formatter
-    formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
-    console_handler.setFormatter(formatter)
-
-    # Add the console handler to the app's logger
-    app.logger.addHandler(console_handler)
-
-# Call the logging configuration function
-configure_logging()
-
-# Dummy data for demonstration
-user_items = {
-    "676afc8d-af2f-4ed2-8c39-9f9a82d18556": [
-        ItemDTO("123", "car"),
-        ItemDTO("4312", "cellphone"),
-        ItemDTO("151", "coffee"),
-    ],
-    "53535353-b670-4527-a34c-66523687b128": [
-        ItemDTO("512", "car"),
-        ItemDTO("21255", "cellphone"),
-        ItemDTO("142", "coffee"),
-        ItemDTO("22112", "tea"),
-    ],
-}
-
-@app.route("/", methods=["GET"])
+from api.http_cache import is_not_modified, items_etag, response_cache, set_validators
+from api.ingest import CSV_MIMETYPES, NDJSON_MIMETYPES, iter_csv, iter_ndjson, load_items
+from api.json_provider import get_json_provider_class
+from api.logger_utils import configure_logging
+from api.metrics import REGISTRY
+from api.migrate import prepare_schema
+from api.models import (
+    db,
+    get_items_version,
+    iter_user_items,
+    list_user_items,
+    user_cache,
+    verify_user,
+)
+from api.pagination import InvalidPageRequest, decode_cursor, encode_cursor, parse_limit
+from api.replicas import REPLICA_BIND_KEYS, recent_writers, replica_binds, route_reads
+from api.startup import API_STARTUP_MODE, WarmUp
+from api.streaming import (
+    NDJSON_MIMETYPE,
+    negotiate_stream_mimetype,
+    stream_json_array,
+    stream_ndjson,
+)
+
+bp = Blueprint("api", __name__)
+
+# Policies referenced by require_auth below (see api.policy)
+ROUTE_POLICIES = ("items:read", "items:write")
+# Served while warm-up fails: probes and scrapes need neither the schema nor signing keys
+WARMUP_EXEMPT_ENDPOINTS = ("api.ready", "api.metrics", "api.pool_metrics", "api.public")
+
+
+def create_app(startup_mode=API_STARTUP_MODE):
+    # Initialize the Flask app
+    app = Flask(__name__)
+    app.json = get_json_provider_class()(app)
+    CORS(app)
+
+    # Configure the database URI
+    app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv("SQLALCHEMY_DATABASE_URI", "postgresql://user:password@db:5432/mydatabase")
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(app.config["SQLALCHEMY_DATABASE_URI"])
+    # Read replicas, if any, are binds that only RoutingSession selects (see api.replicas)
+    app.config["SQLALCHEMY_BINDS"] = replica_binds()
+
+    # Initialize the database
+    db.init_app(app)
+
+    # Configure logging
+    configure_logging()
+    # A policy file missing a route's policy fails here rather than on the first request
+    validator.policies.require(*ROUTE_POLICIES)
+    app.register_blueprint(bp)
+    caches = {
+        "token": validator.token_cache,
+        "user": user_cache,
+        "jwks": validator.jwks.shared_cache,
+    }
+    if validator.introspector is not None:
+        caches["introspection"] = validator.introspector
+    if response_cache is not None:
+        caches["items_response"] = response_cache
+    if REPLICA_BIND_KEYS:
+        caches["recent_writers"] = recent_writers
+    instrumentation.init_app(app, db, caches)
+
+    # Schema check and key loading are deferred so importing the app does no I/O.
+    # Migrations run once per deploy (python -m api.migrate), not in every worker
+    def check_schema():
+        with app.app_context(), db.engine.begin() as connection:
+            prepare_schema(connection)
+
+    warmup = WarmUp([("schema", check_schema), ("jwks", validator.jwks.load)], startup_mode)
+    app.extensions["warmup"] = warmup
+
+    @app.before_request
+    def ensure_warm():
+        if (
+            not warmup.ready
+            and request.endpoint not in WARMUP_EXEMPT_ENDPOINTS
+            and not warmup.run()
+        ):
+            # Same answer as /api/ready instead of failing deeper in the request
+            return jsonify(warmup.status()), 503
+
+    if startup_mode == "eager":
+        warmup.run()
+    elif startup_mode == "background":
+        warmup.start_background()
+
+    return app
+
+
+def warm_up(app):
+    """Run the startup steps now, e.g. from a pre-fork server hook."""
+    return app.extensions["warmup"].run()
+
+
+@bp.route("/", methods=["GET"])
 def index():
-    app.logger.info("Index route accessed")
+    current_app.logger.debug("Index route accessed")
     return render_template("index.html")
 
-@app.route("/api/users/<string:user_id>/items", methods=["GET"])
-@require_auth(None)
+@bp.route("/api/ready", methods=["GET"])
+def ready():
+    warmup = current_app.extensions["warmup"]
+    if not warmup.ready:
+        # Readiness probes must not block; kick off warm-up and report progress
+        warmup.start_background()
+    return jsonify(warmup.status()), 200 if warmup.ready else 503
+
+def resolve_owner(user_id):
+    """Map the route's user id to the caller's local user id; users only see their own items."""
+    if user_id != current_token.get("sub"):
+        return None, (jsonify({"error": "Forbidden"}), 403)
+    owner_id = verify_user(current_token)
+    if owner_id is None:
+        return None, (jsonify({"error": "Unknown user"}), 403)
+    return owner_id, None
+
+def wants_ndjson():
+    return negotiate_stream_mimetype(request.accept_mimetypes) == NDJSON_MIMETYPE
+
+@bp.route("/api/users/<string:user_id>/items", methods=["GET"])
+@require_auth("items:read")
 def get_user_items(user_id):
-    app.logger.info(f"Getting items for user: {user_id}")
-    return jsonify({"items": user_items["53535353-b670-4527-a34c-66523687b128"]})
-
-@app.route("/api/public", methods=["GET"])
+    current_app.logger.debug("Getting items for user: %s", user_id)
+    owner_id, error = resolve_owner(user_id)
+    if error:
+        return error
+
+    try:
+        limit = parse_limit(request.args.get("limit"))
+        after_id = decode_cursor(request.args.get("cursor"))
+    except InvalidPageRequest as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Reads below may go to a replica, unless this user wrote within the last few seconds
+    route_reads(db.session, owner_id)
+    stream = request.args.get("stream", "").lower() in ("1", "true", "yes") or wants_ndjson()
+    mimetype = negotiate_stream_mimetype(request.accept_mimetypes) if stream else None
+    # Conditional GET: answered from the owner's items version before any listing query
+    version, modified_at = get_items_version(owner_id)
+    etag = items_etag(owner_id, version, mimetype, after_id, None if stream else limit)
+    if is_not_modified(request, etag, modified_at):
+        return set_validators(current_app.response_class(status=304), etag, modified_at)
+
+    if stream:
+        # Stream the whole listing from a server-side cursor with flat memory use
+        items = (ItemDTO(str(row.id), row.name) for row in iter_user_items(owner_id, after_id))
+        if mimetype == NDJSON_MIMETYPE:
+            body = stream_ndjson(items)
+        else:
+            body = stream_json_array("items", items)
+        response = Response(stream_with_context(body), mimetype=mimetype)
+        return set_validators(response, etag, modified_at)
+
+    body = response_cache.get(etag) if response_cache is not None else None
+    if body is None:
+        rows, has_more = list_user_items(owner_id, after_id, limit)
+        next_cursor = encode_cursor(rows[-1].id) if has_more else None
+        items = [ItemDTO(str(row.id), row.name) for row in rows]
+        body = jsonify({"items": items, "next_cursor": next_cursor}).get_data()
+        if response_cache is not None:
+            response_cache.set(etag, body)
+    response = current_app.response_class(body, mimetype="application/json")
+    return set_validators(response, etag, modified_at)
+
+@bp.route("/api/users/<string:user_id>/items/bulk", methods=["POST"])
+@require_auth("items:write")
+def bulk_load_user_items(user_id):
+    current_app.logger.info("Bulk loading items for user: %s", user_id)
+    owner_id, error = resolve_owner(user_id)
+    if error:
+        return error
+
+    # The body is parsed as a stream, never buffered whole
+    if request.mimetype in NDJSON_MIMETYPES:
+        rows = iter_ndjson(request.stream)
+    elif request.mimetype in CSV_MIMETYPES:
+        rows = iter_csv(request.stream)
+    else:
+        return jsonify({"error": "Content-Type must be NDJSON or CSV"}), 415
+
+    report = load_items(owner_id, rows)
+    # A failed batch write ends the load; the report says which batches were committed
+    return jsonify(report), 500 if "error" in report else 200
+
+@bp.route("/api/metrics/pool", methods=["GET"])
+def pool_metrics():
+    stats = pool_stats(db.engine)
+    if REPLICA_BIND_KEYS:
+        stats["replicas"] = {key: pool_stats(db.engines[key]) for key in REPLICA_BIND_KEYS}
+    return jsonify(stats)
+
+@bp.route("/metrics", methods=["GET"])
+def metrics():
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+@bp.route("/api/public", methods=["GET"])
 def public():
-    app.logger.info("Public route accessed")
+    current_app.logger.debug("Public route accessed")
     response = "No Authorization need it"
     return jsonify(response)
 
-@app.route("/api/private", methods=["GET"])
+@bp.route("/api/private", methods=["GET"])
 @require_auth(None)
 def private():
-    app.logger.info("Private route accessed")
+    current_app.logger.debug("Private route accessed")
     return jsonify(current_token)
 
+app = create_app()
+
 if __name__ == "__main__":
-    app.run(debug=True, host="0.0.0.0", port=4000)
\ No newline at end of file
+    # Development server only; production runs under gunicorn (see gunicorn.conf.py)
+    app.run(
+        debug=os.getenv("FLASK_DEBUG", "true").lower() == "true",
+        host="0.0.0.0",
+        port=int(os.getenv("PORT", "4000")),
+    )
@@ -0,0 +1,179 @@
+"""Async (ASGI) variant of the protected routes: ``uvicorn api.asgi:app``.
+
+Token verification and user/item reads never block the event loop, so one process can
+hold many concurrent, slow or long-lived connections. Requires the ``async`` extra.
+"""
+
+import asyncio
+import logging
+import os
+import time
+
+from quart import Blueprint, Quart, Response, current_app, g, jsonify, request
+from quart_cors import cors
+
+from api import async_models
+from api.async_auth import async_validator, require_auth_async
+from api.dtos import ItemDTO
+from api.http_cache import is_not_modified, items_etag, set_validators
+from api.logger_utils import configure_logging
+from api.metrics import REGISTRY, REQUEST_SECONDS
+from api.pagination import InvalidPageRequest, decode_cursor, encode_cursor, parse_limit
+from api.cache import run_off_loop
+from api.replicas import REPLICA_BIND_KEYS, SQLALCHEMY_REPLICA_URIS, read_replica, recent_writers
+from api.startup import WARMUP_RETRY_INTERVAL
+
+logger = logging.getLogger("startup_logger")
+
+bp = Blueprint("api", __name__)
+
+# Served while warm-up fails, as in the sync app
+WARMUP_EXEMPT_ENDPOINTS = ("api.ready", "api.metrics", "api.public")
+
+
+def create_app():
+    app = Quart(__name__)
+    app = cors(app, allow_origin="*")
+    database_uri = os.getenv(
+        "SQLALCHEMY_DATABASE_URI", "postgresql://user:password@db:5432/mydatabase"
+    )
+    configure_logging()
+    async_validator.validator.policies.require("items:read")
+    app.register_blueprint(bp)
+    app.config["READY"] = False
+    app.extensions["warmup_lock"] = asyncio.Lock()
+    app.extensions["warmup_attempt"] = None
+
+    @app.before_serving
+    async def startup():
+        app.extensions["engine"] = async_models.create_engine(database_uri)
+        app.extensions["replica_engines"] = {
+            key: async_models.create_engine(uri)
+            for key, uri in zip(REPLICA_BIND_KEYS, SQLALCHEMY_REPLICA_URIS)
+        }
+        await async_validator.fetcher.start()
+        await warm_up(app)
+
+    @app.after_serving
+    async def shutdown():
+        await async_validator.fetcher.stop()
+        await app.extensions["engine"].dispose()
+        for engine in app.extensions["replica_engines"].values():
+            await engine.dispose()
+
+    @app.before_request
+    async def start_timer():
+        g.request_started = time.perf_counter()
+        if not app.config["READY"] and request.endpoint not in WARMUP_EXEMPT_ENDPOINTS:
+            if not await warm_up(app):
+                return jsonify({"ready": False}), 503
+
+    @app.after_request
+    async def observe_request(response):
+        started = g.pop("request_started", None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule else "unmatched"
+            REQUEST_SECONDS.labels(request.method, route, str(response.status_code)).observe(
+                time.perf_counter() - started
+            )
+        return response
+
+    return app
+
+
+async def warm_up(app):
+    """Check the schema and load the signing keys once; failures are retried on demand."""
+    if app.config["READY"]:
+        return True
+    async with app.extensions["warmup_lock"]:
+        last_attempt = app.extensions["warmup_attempt"]
+        if app.config["READY"] or (
+            last_attempt is not None and time.monotonic() - last_attempt < WARMUP_RETRY_INTERVAL
+        ):
+            return app.config["READY"]
+        app.extensions["warmup_attempt"] = started = time.monotonic()
+        try:
+            await async_models.prepare_schema(app.extensions["engine"])
+            await async_validator.fetcher.load()
+        except Exception as e:
+            logger.error("Async warm-up failed: %s", e)
+            return False
+        app.config["READY"] = True
+        logger.info("Async app ready after %.3fs", time.monotonic() - started)
+        return True
+
+
+@bp.route("/api/ready", methods=["GET"])
+async def ready():
+    is_ready = current_app.config["READY"]
+    return jsonify({"ready": is_ready}), 200 if is_ready else 503
+
+
+async def read_engine(owner_id):
+    """A replica engine for ``owner_id``'s reads, or the primary after their own writes."""
+    if not REPLICA_BIND_KEYS:
+        return current_app.extensions["engine"]
+    replica = await run_off_loop(recent_writers, read_replica, owner_id)
+    if replica is None:
+        return current_app.extensions["engine"]
+    return current_app.extensions["replica_engines"][replica]
+
+
+async def resolve_owner(user_id):
+    if user_id != g.token.get("sub"):
+        return None, (jsonify({"error": "Forbidden"}), 403)
+    owner_id = await async_models.verify_user(current_app.extensions["engine"], g.token)
+    if owner_id is None:
+        return None, (jsonify({"error": "Unknown user"}), 403)
+    return owner_id, None
+
+
+@bp.route("/api/users/<string:user_id>/items", methods=["GET"])
+@require_auth_async("items:read")
+async def get_user_items(user_id):
+    owner_id, error = await resolve_owner(user_id)
+    if error:
+        return error
+
+    try:
+        limit = parse_limit(request.args.get("limit"))
+        after_id = decode_cursor(request.args.get("cursor"))
+    except InvalidPageRequest as e:
+        return jsonify({"error": str(e)}), 400
+
+    engine = await read_engine(owner_id)
+    row = await async_models.get_items_version(engine, owner_id)
+    if row is None and engine is not current_app.extensions["engine"]:
+        # A replica lagging past the read-your-writes window has not seen the user yet
+        engine = current_app.extensions["engine"]
+        row = await async_models.get_items_version(engine, owner_id)
+    version, modified_at = row
+    # Same validators as the sync app, so clients may poll either one
+    etag = items_etag(owner_id, version, None, after_id, limit)
+    if is_not_modified(request, etag, modified_at):
+        return set_validators(current_app.response_class(status=304), etag, modified_at)
+
+    rows, has_more = await async_models.list_user_items(engine, owner_id, after_id, limit)
+    next_cursor = encode_cursor(rows[-1].id) if has_more else None
+    items = [ItemDTO(str(row.id), row.name) for row in rows]
+    response = jsonify({"items": items, "next_cursor": next_cursor})
+    return set_validators(response, etag, modified_at)
+
+
+@bp.route("/metrics", methods=["GET"])
+async def metrics():
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+
+@bp.route("/api/public", methods=["GET"])
+async def public():
+    return jsonify("No Authorization need it")
+
+
+@bp.route("/api/private", methods=["GET"])
+@require_auth_async()
+async def private():
+    return jsonify(g.token)
+
+
+app = create_app()
@@ -0,0 +1,156 @@
+import asyncio
+import functools
+import logging
+import time
+
+import httpx
+from authlib.oauth2.base import OAuth2Error
+from quart import g, jsonify, request
+
+from api.auth import token_cache_key, token_kid, validator as sync_validator
+from api.cache import run_off_loop
+from api.jwks import JWKS_FETCH_TIMEOUT, JWKS_REFRESH_MIN
+
+logger = logging.getLogger("auth_logger")
+
+
+class AsyncJWKSFetcher:
+    """Fetches the realm keys of a ``JWKSManager`` with httpx instead of a blocking urlopen."""
+
+    def __init__(self, jwks):
+        self.jwks = jwks
+        self._client = None
+        self._lock = asyncio.Lock()
+        self._refresher = None
+
+    async def start(self):
+        self._client = httpx.AsyncClient(timeout=JWKS_FETCH_TIMEOUT)
+        self._refresher = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._refresher:
+            self._refresher.cancel()
+        if self._client:
+            await self._client.aclose()
+
+    async def load(self):
+        # Shared cache and fallback file reads may block; keep them off the loop
+        if not await asyncio.to_thread(self.jwks.load_stored):
+            await self.refresh()
+        self.jwks.loaded = True
+
+    async def refresh(self):
+        """Fetch the key set once; concurrent callers wait for the in-flight fetch."""
+        started = time.monotonic()
+        async with self._lock:
+            if self.jwks.last_fetch and self.jwks.last_fetch >= started:
+                return
+            self.jwks.last_attempt = time.monotonic()
+            response = await self._client.get(self.jwks.jwks_url)
+            response.raise_for_status()
+            jwks = response.json()
+            self.jwks.apply_fetched(jwks, response.headers.get("Cache-Control"))
+        if self.jwks.fallback_file:
+            await asyncio.to_thread(self.jwks.write_fallback, jwks)
+
+    async def get_key(self, kid):
+        key = self.jwks.lookup(kid)
+        if key is None and self.jwks.may_fetch():
+            logger.info("Unknown JWKS kid %s, refreshing key set", kid)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error("Failed to refresh JWKS for kid %s: %s", kid, e)
+            key = self.jwks.lookup(kid)
+        return key
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(max(self.jwks.next_refresh - time.monotonic(), JWKS_REFRESH_MIN))
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error("Background JWKS refresh failed: %s", e)
+
+
+class AsyncTokenValidator:
+    """Verifies bearer tokens like ``ClientCredsTokenValidator`` without blocking the loop.
+
+    The key set, claim rules and token cache are shared with the sync validator; only key
+    fetching is async. Signature checks are CPU-bound and stay inline, unless the token
+    cache has a shared tier, whose round trips run in a worker thread.
+    """
+
+    def __init__(self, validator=sync_validator):
+        self.validator = validator
+        self.fetcher = AsyncJWKSFetcher(validator.jwks)
+
+    async def authenticate_token(self, token_string):
+        token_cache = self.validator.token_cache
+        try:
+            key = await self.fetcher.get_key(token_kid(token_string))
+        except (ValueError, AttributeError):
+            key = None
+        if key is not None:
+            # A single token cache lookup: get_or_set answers tokens verified earlier
+            return await run_off_loop(token_cache, self.validator.decode_token, token_string, key)
+        # Opaque tokens and unknown keys: claims accepted by introspection are cached
+        cached_token = await run_off_loop(token_cache, self.validator.cached_token, token_string)
+        if cached_token is not None:
+            return cached_token
+        if self.validator.introspector is not None:
+            return await self._introspect(token_string)
+        logger.error("Failed to authenticate token: no signing key found")
+        return None
+
+    async def _introspect(self, token_string):
+        introspector = self.validator.introspector
+        cache_key = token_cache_key(token_string)
+        result = await run_off_loop(introspector.cache, introspector.cached, cache_key)
+        if result is None:
+            try:
+                future = introspector.submit(token_string, cache_key)
+                result = await asyncio.wrap_future(future)
+            except Exception as e:
+                logger.error("Token introspection failed for %s: %s", cache_key[:12], e)
+                return None
+        claims = self.validator.introspected_token(result, cache_key)
+        if claims is not None:
+            # Answered from the token cache from now on, as in the sync validator
+            token_cache = self.validator.token_cache
+            await run_off_loop(token_cache, token_cache.set, cache_key, claims, claims["exp"])
+        return claims
+
+
+async_validator = AsyncTokenValidator()
+
+
+def _error(status_code, error, description):
+    response = jsonify({"error": error, "error_description": description})
+    response.status_code = status_code
+    response.headers["WWW-Authenticate"] = f'Bearer error="{error}"'
+    return response
+
+
+def require_auth_async(policy=None):
+    """Async counterpart of ``require_auth(policy)``; the claims are exposed as ``g.token``."""
+
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(*args, **kwargs):
+            scheme, _, token_string = request.headers.get("Authorization", "").partition(" ")
+            if scheme.lower() != "bearer" or not token_string:
+                return _error(401, "missing_authorization", "Missing 'Authorization' in headers.")
+            token = await async_validator.authenticate_token(token_string)
+            if token is None:
+                return _error(401, "invalid_token", "The access token provided is invalid.")
+            try:
+                async_validator.validator.authorize(token, policy)
+            except OAuth2Error as e:
+                return _error(e.status_code, e.error, e.get_error_description())
+            g.token = token
+            return await view(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
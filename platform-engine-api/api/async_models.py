@@ -0,0 +1,88 @@
+import logging
+import time
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from api import migrate
+from api.database import DB_POOL_MODE, InstrumentedQueuePool, engine_options
+from api.models import (
+    VERIFY_USER_DB_SECONDS,
+    claim_user_stmt,
+    items_version_stmt,
+    upsert_user_stmt,
+    user_cache,
+    user_cache_key,
+    user_items_stmt,
+)
+from api.cache import run_off_loop
+from api.replicas import REPLICA_BIND_KEYS, mark_written, recent_writers
+
+# Async drivers for the sync URLs used elsewhere in the API
+_ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+
+
+def async_database_uri(database_uri):
+    url = make_url(database_uri)
+    driver = _ASYNC_DRIVERS.get(url.get_backend_name())
+    return url.set(drivername=f"{url.get_backend_name()}+{driver}") if driver else url
+
+
+def create_engine(database_uri):
+    """An async engine for ``database_uri`` honoring the DB_POOL_* settings."""
+    url = async_database_uri(database_uri)
+    options = engine_options(database_uri)
+    if options.get("poolclass") is InstrumentedQueuePool:
+        # Async engines need an asyncio-aware pool; the default one is sized the same way
+        del options["poolclass"]
+    if DB_POOL_MODE == "pgbouncer" and url.get_driver_name() == "asyncpg":
+        # Prepared statements do not survive PgBouncer transaction pooling
+        options["connect_args"] = {"statement_cache_size": 0}
+    return create_async_engine(url, **options)
+
+
+async def prepare_schema(engine):
+    async with engine.begin() as conn:
+        await conn.run_sync(migrate.prepare_schema)
+
+
+async def verify_user(engine, token):
+    """Async ``api.models.verify_user``; shares its user cache, used off the event loop."""
+    if not token.get("sub"):
+        return None
+    cache_key = user_cache_key(token)
+    user_id = await run_off_loop(user_cache, user_cache.get, cache_key)
+    if user_id is not None:
+        return user_id
+
+    stmt = upsert_user_stmt(engine.dialect.name, token)
+    started = time.perf_counter()
+    try:
+        async with engine.begin() as conn:
+            if token.get("email"):
+                await conn.execute(claim_user_stmt(token))
+            user_id = (await conn.execute(stmt)).scalar_one()
+            if REPLICA_BIND_KEYS:
+                await run_off_loop(recent_writers, mark_written, user_id)
+    except Exception as e:
+        logging.error("Error while verifying user: %s", e)
+        return None
+    finally:
+        VERIFY_USER_DB_SECONDS.observe(time.perf_counter() - started)
+
+    await run_off_loop(user_cache, user_cache.set, cache_key, user_id)
+    return user_id
+
+
+async def list_user_items(engine, owner_id, after_id=None, limit=50):
+    """Async ``api.models.list_user_items``."""
+    async with engine.connect() as conn:
+        result = await conn.execute(user_items_stmt(owner_id, after_id).limit(limit + 1))
+        rows = result.all()
+    return rows[:limit], len(rows) > limit
+
+
+async def get_items_version(engine, owner_id):
+    """Async ``api.models.get_items_version``; None when ``engine`` does not know the owner."""
+    async with engine.connect() as conn:
+        return (await conn.execute(items_version_stmt(owner_id))).one_or_none()
@@ -1,70 +1,169 @@
+import hashlib
 import json
 import os
-from urllib.request import urlopen
 import time
+from authlib.common.encoding import to_bytes, urlsafe_b64decode
 from authlib.integrations.flask_oauth2 import ResourceProtector
-from authlib.jose.rfc7517.jwk import JsonWebKey
 from authlib.oauth2.rfc7523 import JWTBearerTokenValidator
-from authlib.oauth2.rfc6750.errors import InvalidTokenError
+from authlib.oauth2.rfc6750.errors import InsufficientScopeError, InvalidTokenError
 import logging
 
+from api.cache import make_cache
+from api.introspection import create_introspector
+from api.jwks import JWKSManager
+from api.logger_utils import configure_logging
+from api.metrics import STAGE_SECONDS
+from api.policy import AZP_DENIED, Grants, load_policies
 from api.models import verify_user
 
 # Configure logging
+configure_logging()
 logger = logging.getLogger("auth_logger")
-logger.setLevel(logging.DEBUG)
-
-console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.DEBUG)
-
-formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
-console_handler.setFormatter(formatter)
-
-logger.addHandler(console_handler)
 
 KEYCLOAK_SERVER_URL = os.getenv("KEYCLOAK_SERVER_URL")
 KEYCLOAK_REALM_NAME = os.getenv("KEYCLOAK_REALM_NAME")
 
 KEYCLOAK_ISSUER = f"{KEYCLOAK_SERVER_URL}/realms/{KEYCLOAK_REALM_NAME}"
 
+# Verified claims are cached per token until the token's own 'exp'
+TOKEN_CACHE_MAX_SIZE = int(os.getenv("TOKEN_CACHE_MAX_SIZE", "4096"))
+
+JWT_VERIFY_SECONDS = STAGE_SECONDS.labels("jwt_verify")
+
 
-from authlib.jose import jwt
+from authlib.jose import JWTClaims, jwt
 from flask import request, jsonify
 
+
+def token_cache_key(token_string):
+    return hashlib.sha256(token_string.encode("utf-8")).hexdigest()
+
+
+def token_kid(token_string):
+    """The 'kid' from a compact JWS header, read without verifying anything."""
+    header_segment = token_string.split(".", 1)[0]
+    return json.loads(urlsafe_b64decode(to_bytes(header_segment))).get("kid")
+
+
 class ClientCredsTokenValidator(JWTBearerTokenValidator):
     def __init__(self, issuer):
-        logger.info(f"Initializing ClientCredsTokenValidator with issuer: {issuer}")
+        logger.info("Initializing ClientCredsTokenValidator with issuer: %s", issuer)
         try:
-            jsonurl = urlopen(f"{issuer}/protocol/openid-connect/certs")
-            public_key = JsonWebKey.import_key_set(json.loads(jsonurl.read()))
-            super(ClientCredsTokenValidator, self).__init__(public_key)
+            # Keys are resolved per token by 'kid' and loaded on first use, never at import
+            self.jwks = JWKSManager(
+                f"{issuer}/protocol/openid-connect/certs",
+                shared_cache=make_cache("jwks", maxsize=1),
+            )
+            super(ClientCredsTokenValidator, self).__init__(self.jwks.load_key)
             self.claims_options = {
                 "exp": {"essential": True},
                 "iss": {"essential": True, "value": issuer},
             }
+            # Shared with other workers when CACHE_REDIS_URL is set, so a token is
+            # verified once per deployment rather than once per process
+            self.token_cache = make_cache(
+                "token",
+                maxsize=TOKEN_CACHE_MAX_SIZE,
+                dumps=self._dump_claims,
+                loads=self._load_claims,
+            )
+            # Compiled once; routes reference policies by name through require_auth
+            self.policies = load_policies()
+            # Fallback for opaque tokens and tokens signed with keys we do not hold
+            self.introspector = create_introspector(issuer)
             logger.info("Successfully initialized ClientCredsTokenValidator")
         except Exception as e:
-            logger.error(f"Failed to initialize ClientCredsTokenValidator: {e}")
+            logger.error("Failed to initialize ClientCredsTokenValidator: %s", e)
             raise
 
     def authenticate_token(self, token_string):
-        logger.info(f"Authenticating token: {token_string}")
+        if self.introspector is not None and not self.verifiable_locally(token_string):
+            cached_token = self.cached_token(token_string)
+            if cached_token is not None:
+                return cached_token
+            cache_key = token_cache_key(token_string)
+            result = self.introspector.introspect(token_string, cache_key)
+            claims = self.introspected_token(result, cache_key)
+            if claims is not None:
+                # Answered by cached_token from now on, like a verified JWT
+                self.token_cache.set(cache_key, claims, expires_at=claims["exp"])
+            return claims
+        # A single token cache lookup: get_or_set answers tokens verified earlier
+        return self.decode_token(token_string, self.public_key)
+
+    def verifiable_locally(self, token_string):
+        """Whether ``token_string`` is a JWS signed with a key from the realm key set."""
         try:
-            decoded_token = jwt.decode(token_string, self.public_key, claims_options=self.claims_options)
-            logger.debug(f"Decoded Token: {decoded_token}")
-
-            # Explicitly check the 'azp' claim
-            if decoded_token.get("azp") != "client-web":
-                logger.error(f"Token 'azp' claim mismatch. Expected 'client-web', got '{decoded_token.get('azp')}'")
-                raise InvalidTokenError(description="Unauthorized azp claim")
-
+            kid = token_kid(token_string)
+        except (ValueError, AttributeError):
+            return False
+        return self.jwks.get_key(kid) is not None
+
+    def cached_token(self, token_string):
+        return self.token_cache.get(token_cache_key(token_string))
+
+    def decode_token(self, token_string, key):
+        """Verify ``token_string`` with ``key`` (a key or resolver) and cache its claims."""
+        cache_key = token_cache_key(token_string)
+        # 'exp' is essential, so every verified token carries an expiry
+        return self.token_cache.get_or_set(
+            cache_key,
+            lambda: self._verify_token(token_string, key, cache_key),
+            expires_at=lambda claims: claims["exp"],
+        )
+
+    def _verify_token(self, token_string, key, cache_key):
+        # Never log the bearer token itself; the digest prefix is enough to correlate
+        logger.debug("Authenticating token %s", cache_key[:12])
+        try:
+            started = time.perf_counter()
+            decoded_token = jwt.decode(token_string, key, claims_options=self.claims_options)
+            decoded_token.validate(leeway=self.leeway)
+            JWT_VERIFY_SECONDS.observe(time.perf_counter() - started)
+            logger.debug("Decoded token %s for sub %s", cache_key[:12], decoded_token.get("sub"))
+            decoded_token.grants = Grants(decoded_token)
             return decoded_token
         except Exception as e:
-            logger.error(f"Failed to authenticate token: {e}")
+            logger.error("Failed to authenticate token: %s", e)
+            return None
+
+    def introspected_token(self, result, cache_key):
+        """Claims from an introspection response, held to the same rules as a local JWT."""
+        if not result or not result.get("active"):
+            logger.error("Failed to authenticate token %s: not active", cache_key[:12])
+            return None
+        try:
+            claims = JWTClaims(result, {"typ": "introspected"}, options=self.claims_options)
+            claims.validate(leeway=self.leeway)
+            claims.grants = Grants(claims)
+            return claims
+        except Exception as e:
+            logger.error("Failed to authenticate token: %s", e)
             return None
 
+    def _dump_claims(self, claims):
+        return json.dumps({"header": claims.header, "claims": claims})
+
+    def _load_claims(self, raw):
+        data = json.loads(raw)
+        claims = JWTClaims(data["claims"], data["header"], options=self.claims_options)
+        claims.grants = Grants(claims)
+        return claims
+
+    def authorize(self, token, policy_name=None):
+        """Apply the named policy; raises the OAuth2 error the client should receive."""
+        policy = self.policies.get(policy_name)
+        grants = getattr(token, "grants", None) or Grants(token)
+        denial = policy.denial(grants)
+        if denial == AZP_DENIED:
+            logger.error("Token 'azp' claim %r is not allowed by policy %s", grants.azp, policy.name)
+            raise InvalidTokenError(description="Unauthorized azp claim")
+        if denial is not None:
+            logger.info("Token for sub %s lacks the %s required by policy %s", token.get("sub"), denial, policy.name)
+            raise InsufficientScopeError()
+
     def validate_token(self, token, scopes, request):
-        logger.info("Starting token validation")
+        logger.debug("Starting token validation")
         if not token:
             logger.error("Token is None. Validation cannot proceed.")
             raise InvalidTokenError(realm=self.realm, extra_attributes=self.extra_attributes)
@@ -73,7 +172,14 @@ class ClientCredsTokenValidator(JWTBearerTokenValidator):
             logger.error("Token object does not have an exp in token")
             raise TypeError("Invalid token object: missing exp details in token")
 
-        logger.info("Token successfully validated")
+        # require_auth("<policy>") passes the policy name as its scope
+        if isinstance(scopes, str) or not scopes:
+            self.authorize(token, scopes or None)
+        else:
+            for policy_name in scopes:
+                self.authorize(token, policy_name)
+
+        logger.debug("Token successfully validated")
 
 
 require_auth = ResourceProtector()# Log the public key in a readable format
@@ -0,0 +1,285 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import redis
+    from redis.backoff import NoBackoff
+    from redis.retry import Retry
+except ImportError:  # pragma: no cover - redis is an optional extra
+    redis = None
+
+logger = logging.getLogger("cache_logger")
+
+# Shared tier spoken over the Redis protocol; unset keeps every cache in-process only
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL")
+CACHE_KEY_PREFIX = os.getenv("CACHE_KEY_PREFIX", "platform-engine-api:")
+# Socket timeout in seconds; the shared tier must never be slower than the work it saves
+CACHE_REDIS_TIMEOUT = float(os.getenv("CACHE_REDIS_TIMEOUT", "0.25"))
+# Seconds the shared tier is bypassed after an error
+CACHE_SHARED_RETRY_INTERVAL = float(os.getenv("CACHE_SHARED_RETRY_INTERVAL", "5"))
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Bounded, thread-safe LRU cache whose entries carry their own expiry time."""
+
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, expires_at=None):
+        """Store ``value``; ``expires_at`` (epoch seconds) overrides the cache-wide ttl."""
+        if expires_at is None and self.ttl is not None:
+            expires_at = time.time() + self.ttl
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+class SharedTier:
+    """Cache tier on a Redis-protocol server, shared by every worker and replica.
+
+    Errors are logged and treated as misses; after one, the tier is skipped for
+    ``CACHE_SHARED_RETRY_INTERVAL`` seconds so a dead server costs one timeout, not one
+    per request.
+    """
+
+    def __init__(self, client, prefix, dumps=json.dumps, loads=json.loads):
+        self.client = client
+        self.prefix = prefix
+        self.dumps = dumps
+        self.loads = loads
+        self.errors = 0
+        self._down_until = 0.0
+
+    def get(self, key):
+        """Return ``(value, expires_at)``, or ``(None, None)`` on a miss."""
+        if time.monotonic() < self._down_until:
+            return None, None
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            pipe.get(self.prefix + key)
+            pipe.pttl(self.prefix + key)
+            raw, pttl = pipe.execute()
+        except Exception as e:
+            self._failed(e)
+            return None, None
+        if raw is None:
+            return None, None
+        expires_at = time.time() + pttl / 1000 if pttl and pttl > 0 else None
+        return self.loads(raw), expires_at
+
+    def set(self, key, value, expires_at=None, ttl=None):
+        if time.monotonic() < self._down_until:
+            return
+        if expires_at is not None:
+            ttl = expires_at - time.time()
+            if ttl <= 0:
+                return
+        try:
+            px = max(int(ttl * 1000), 1) if ttl is not None else None
+            self.client.set(self.prefix + key, self.dumps(value), px=px)
+        except Exception as e:
+            self._failed(e)
+
+    def delete(self, key):
+        try:
+            self.client.delete(self.prefix + key)
+        except Exception as e:
+            self._failed(e)
+
+    def _failed(self, error):
+        self.errors += 1
+        self._down_until = time.monotonic() + CACHE_SHARED_RETRY_INTERVAL
+        logger.warning("Shared cache %s unavailable: %s", self.prefix, error)
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TieredCache:
+    """An in-process ``LRUCache`` in front of an optional ``SharedTier``.
+
+    ``get_or_set`` is single-flight: concurrent misses on one key within a process run
+    the loader once and the other callers wait for its result.
+    """
+
+    def __init__(self, local, shared=None):
+        self.local = local
+        self.shared = shared
+        self.shared_hits = 0
+        self.coalesced = 0
+        self._flights = {}
+        self._flights_lock = threading.Lock()
+
+    def get(self, key, default=None):
+        value = self.local.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        if self.shared is None:
+            return default
+        value, expires_at = self.shared.get(key)
+        if value is None:
+            return default
+        self.shared_hits += 1
+        self.local.set(key, value, expires_at)
+        return value
+
+    def set(self, key, value, expires_at=None):
+        self.local.set(key, value, expires_at)
+        if self.shared is not None:
+            self.shared.set(key, value, expires_at, ttl=self.local.ttl)
+
+    def delete(self, key):
+        self.local.delete(key)
+        if self.shared is not None:
+            self.shared.delete(key)
+
+    def clear(self):
+        self.local.clear()
+
+    def get_or_set(self, key, loader, expires_at=None):
+        """Return the cached value or ``loader()``, caching results that are not None.
+
+        ``expires_at`` is epoch seconds or a callable computing them from the value.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+        with self._flights_lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            self.coalesced += 1
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+        try:
+            value = flight.value = loader()
+            if value is not None:
+                self.set(key, value, expires_at(value) if callable(expires_at) else expires_at)
+            return value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._flights_lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def __len__(self):
+        return len(self.local)
+
+    def stats(self):
+        stats = self.local.stats()
+        # A local miss answered by the shared tier counts as a hit overall
+        stats["local_hits"] = stats["hits"]
+        stats["shared_hits"] = self.shared_hits
+        stats["hits"] += self.shared_hits
+        stats["misses"] -= self.shared_hits
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else None
+        stats["coalesced"] = self.coalesced
+        stats["shared"] = self.shared is not None
+        stats["shared_errors"] = self.shared.errors if self.shared is not None else 0
+        return stats
+
+
+async def run_off_loop(cache, func, *args):
+    """Await ``func(*args)``, a call that may use ``cache``, from async code.
+
+    Shared-tier round trips block, so with a shared tier the call runs in a worker thread;
+    a process-local cache is answered inline.
+    """
+    if cache.shared is None:
+        return func(*args)
+    return await asyncio.to_thread(func, *args)
+
+
+_shared_client = None
+
+
+def shared_client():
+    """The process-wide Redis client, or None when no shared tier is configured."""
+    global _shared_client
+    if _shared_client is None and CACHE_REDIS_URL:
+        if redis is None:
+            logger.warning("CACHE_REDIS_URL is set but redis is not installed; caching locally")
+            return None
+        # RESP2 only: plain GET/SET/PTTL work on any Redis-compatible server
+        _shared_client = redis.Redis.from_url(
+            CACHE_REDIS_URL,
+            protocol=2,
+            socket_timeout=CACHE_REDIS_TIMEOUT,
+            socket_connect_timeout=CACHE_REDIS_TIMEOUT,
+            # A miss is cheaper than retrying; SharedTier backs off on errors instead
+            retry=Retry(NoBackoff(), 0),
+        )
+    return _shared_client
+
+
+def make_cache(name, maxsize=1024, ttl=None, dumps=json.dumps, loads=json.loads):
+    """A ``TieredCache`` named ``name``, shared across processes when CACHE_REDIS_URL is set.
+
+    ``dumps``/``loads`` convert values for the shared tier.
+    """
+    client = shared_client()
+    shared = SharedTier(client, f"{CACHE_KEY_PREFIX}{name}:", dumps, loads) if client else None
+    return TieredCache(LRUCache(maxsize=maxsize, ttl=ttl), shared)
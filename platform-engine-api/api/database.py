@@ -0,0 +1,71 @@
+import os
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import NullPool, QueuePool
+
+from api.metrics import REGISTRY, Counter
+
+# "queue": a pooled engine per worker. "pgbouncer": no client-side pooling (NullPool),
+# for a PgBouncer running in transaction pooling mode in front of Postgres.
+DB_POOL_MODE = os.getenv("DB_POOL_MODE", "queue")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+# Seconds after which a pooled connection is replaced, e.g. below Postgres/LB idle limits
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+pool_wait_seconds = REGISTRY.histogram(
+    "api_db_pool_wait_seconds", "Time spent waiting for a pooled connection."
+)
+pool_timeouts = Counter()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            pool_timeouts.inc()
+            raise
+        finally:
+            pool_wait_seconds.observe(time.perf_counter() - started)
+
+
+def engine_options(database_uri):
+    """SQLALCHEMY_ENGINE_OPTIONS for ``database_uri`` built from the DB_POOL_* settings."""
+    options = {"pool_pre_ping": DB_POOL_PRE_PING}
+    if make_url(database_uri).get_backend_name() == "sqlite":
+        # SQLite picks its own pool class; sizing options do not apply
+        return options
+    if DB_POOL_MODE == "pgbouncer":
+        options["poolclass"] = NullPool
+        return options
+    options.update(
+        poolclass=InstrumentedQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+    )
+    return options
+
+
+def pool_stats(engine):
+    pool = engine.pool
+    stats = {"pool": type(pool).__name__, "mode": DB_POOL_MODE}
+    if isinstance(pool, QueuePool):
+        stats.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=max(pool.overflow(), 0),
+        )
+    stats["timeouts"] = pool_timeouts.value
+    stats["wait_seconds"] = pool_wait_seconds.labels().snapshot()
+    return stats
@@ -0,0 +1,52 @@
+import hashlib
+import os
+from datetime import timezone
+
+from api.cache import LRUCache
+
+# Item listings are per user; "private" keeps them out of shared caches
+ITEMS_CACHE_CONTROL = os.getenv("ITEMS_CACHE_CONTROL", "private, no-cache")
+# Serialized listing pages kept in memory; 0 disables the server-side response cache
+ITEMS_RESPONSE_CACHE_SIZE = int(os.getenv("ITEMS_RESPONSE_CACHE_SIZE", "0"))
+ITEMS_RESPONSE_CACHE_TTL = int(os.getenv("ITEMS_RESPONSE_CACHE_TTL", "300"))
+
+# Keys embed the owner's items version, so a change to the items makes old entries
+# unreachable; they age out through the LRU and the ttl
+response_cache = (
+    LRUCache(maxsize=ITEMS_RESPONSE_CACHE_SIZE, ttl=ITEMS_RESPONSE_CACHE_TTL)
+    if ITEMS_RESPONSE_CACHE_SIZE
+    else None
+)
+
+
+def items_etag(owner_id, version, *variant):
+    """Validator for one representation of an owner's items; the body is never hashed.
+
+    ``variant`` holds whatever selects the representation (page size, cursor, format).
+    """
+    digest = hashlib.blake2b(repr(variant).encode("utf-8"), digest_size=8).hexdigest()
+    return f"{owner_id}-{version}-{digest}"
+
+
+def is_not_modified(request, etag, last_modified=None):
+    # If-None-Match takes precedence over If-Modified-Since (RFC 9110, 13.2.2)
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if last_modified is not None and request.if_modified_since:
+        return _as_utc(last_modified).replace(microsecond=0) <= request.if_modified_since
+    return False
+
+
+def set_validators(response, etag, last_modified=None):
+    # Weak: the same items may serialize differently depending on the JSON provider
+    response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = _as_utc(last_modified)
+    response.headers["Cache-Control"] = ITEMS_CACHE_CONTROL
+    response.vary.update(("Authorization", "Accept"))
+    return response
+
+
+def _as_utc(value):
+    # SQLite hands back naive datetimes; they are stored in UTC
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
@@ -0,0 +1,184 @@
+import csv
+import io
+import logging
+import os
+
+from flask import current_app
+
+from api.models import Item, bump_items_version_stmt, db
+from api.replicas import mark_written
+
+logger = logging.getLogger("ingest_logger")
+
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "5000"))
+ITEM_NAME_MAX_LENGTH = int(os.getenv("ITEM_NAME_MAX_LENGTH", "1024"))
+# Rejected rows are always counted but only this many are echoed back
+INGEST_MAX_REPORTED_REJECTS = int(os.getenv("INGEST_MAX_REPORTED_REJECTS", "1000"))
+
+NDJSON_MIMETYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+CSV_MIMETYPES = ("text/csv", "application/csv")
+
+_COPY_ITEMS_SQL = "COPY items (owner_id, name) FROM STDIN WITH (FORMAT csv)"
+
+
+class DecodedLines:
+    """The lines of a byte stream as text, strictly decoded as UTF-8.
+
+    Lines that are not valid UTF-8 are skipped and kept in ``errors`` as
+    ``(line_no, error)``; ``line_no`` is the number of the last line read.
+    """
+
+    def __init__(self, stream):
+        if isinstance(stream, io.RawIOBase):
+            # e.g. werkzeug's LimitedStream, whose readline would read byte by byte
+            stream = io.BufferedReader(stream)
+        self._lines = iter(stream)
+        self.line_no = 0
+        self.errors = []
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        while True:
+            raw = next(self._lines)
+            self.line_no += 1
+            try:
+                return raw.decode("utf-8")
+            except UnicodeDecodeError as e:
+                self.errors.append((self.line_no, f"Invalid UTF-8: {e}"))
+
+    def pop_errors(self):
+        errors, self.errors = self.errors, []
+        return errors
+
+
+def iter_ndjson(stream):
+    """Yield ``(line_no, row, error)`` for each non-blank line of an NDJSON byte stream."""
+    loads = current_app.json.loads
+    lines = DecodedLines(stream)
+    for line in lines:
+        for line_no, error in lines.pop_errors():
+            yield line_no, None, error
+        if not line.strip():
+            continue
+        try:
+            row = loads(line)
+        except ValueError as e:
+            yield lines.line_no, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(row, dict):
+            yield lines.line_no, None, "Expected a JSON object"
+            continue
+        yield lines.line_no, row, None
+    for line_no, error in lines.pop_errors():
+        yield line_no, None, error
+
+
+def iter_csv(stream):
+    """Yield ``(line_no, row, error)`` for each data row of a CSV byte stream with a header."""
+    lines = DecodedLines(stream)
+    # strict: an unterminated quote at the end of the body is an error, not a value
+    reader = csv.DictReader(lines, strict=True)
+    try:
+        reader.fieldnames
+    except csv.Error as e:
+        lines.errors.append((lines.line_no, f"Invalid CSV: {e}"))
+    if lines.errors:
+        # Without a readable header no row can be interpreted
+        line_no, error = lines.errors[0]
+        yield line_no, None, f"Invalid CSV header: {error}"
+        return
+    while True:
+        try:
+            row, error = next(reader), None
+        except StopIteration:
+            break
+        except csv.Error as e:
+            # e.g. a field over the size limit; the reader resumes on the next line
+            row, error = None, f"Invalid CSV: {e}"
+        for line_no, decode_error in lines.pop_errors():
+            yield line_no, None, decode_error
+        yield lines.line_no, row, error
+    for line_no, error in lines.pop_errors():
+        yield line_no, None, error
+
+
+def validate_item(row):
+    name = row.get("name")
+    if not isinstance(name, str) or not name.strip():
+        raise ValueError("'name' must be a non-empty string")
+    if len(name) > ITEM_NAME_MAX_LENGTH:
+        raise ValueError(f"'name' is longer than {ITEM_NAME_MAX_LENGTH} characters")
+    if "\x00" in name:
+        raise ValueError("'name' must not contain NUL characters")
+    return name
+
+
+def load_items(owner_id, rows, batch_size=INGEST_BATCH_SIZE):
+    """Validate ``rows`` as they stream in and load them in committed batches."""
+    report = {"inserted": 0, "rejected": 0, "batches": [], "rejects": []}
+    batch = []
+
+    def reject(line_no, error):
+        report["rejected"] += 1
+        if len(report["rejects"]) < INGEST_MAX_REPORTED_REJECTS:
+            report["rejects"].append({"line": line_no, "error": error})
+
+    def flush():
+        number = len(report["batches"]) + 1
+        try:
+            _write_batch(owner_id, batch)
+        except Exception:
+            db.session.rollback()
+            logger.exception("Writing batch %d for owner %s failed", number, owner_id)
+            # The earlier batches stay committed; the caller needs to know where it stopped
+            report["error"] = f"Batch {number} ({len(batch)} rows) could not be written"
+            return False
+        report["inserted"] += len(batch)
+        report["batches"].append({"batch": number, "rows": len(batch)})
+        batch.clear()
+        return True
+
+    for line_no, row, error in rows:
+        if error is None:
+            try:
+                batch.append(validate_item(row))
+            except ValueError as e:
+                error = str(e)
+        if error is not None:
+            reject(line_no, error)
+        elif len(batch) >= batch_size and not flush():
+            break
+    if batch and "error" not in report:
+        flush()
+
+    logger.info(
+        "Loaded %d items for owner %s in %d batches, %d rejected",
+        report["inserted"],
+        owner_id,
+        len(report["batches"]),
+        report["rejected"],
+    )
+    return report
+
+
+def _write_batch(owner_id, names):
+    connection = db.session.connection()
+    if connection.dialect.name == "postgresql":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for name in names:
+            writer.writerow((owner_id, name))
+        buffer.seek(0)
+        with connection.connection.cursor() as cursor:
+            cursor.copy_expert(_COPY_ITEMS_SQL, buffer)
+    else:
+        # Dialects without COPY (e.g. SQLite in development) use executemany
+        connection.execute(
+            Item.__table__.insert(), [{"owner_id": owner_id, "name": name} for name in names]
+        )
+    # Invalidates ETags and cached listings of this owner once the batch is visible
+    connection.execute(bump_items_version_stmt(owner_id))
+    mark_written(owner_id)
+    db.session.commit()
@@ -0,0 +1,131 @@
+import time
+from functools import partial
+
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from api.database import pool_stats, pool_timeouts
+from api.metrics import DB_QUERY_SECONDS, REGISTRY, REQUEST_SECONDS
+
+_SQL_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE", "COPY"}
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    operation = statement.lstrip()[:6].upper()
+    DB_QUERY_SECONDS.labels(operation if operation in _SQL_OPERATIONS else "OTHER").observe(
+        elapsed
+    )
+
+
+def _handle_error(context):
+    # after_cursor_execute is skipped for failed statements
+    if context.connection is not None:
+        started = context.connection.info.get("query_started")
+        if started:
+            started.pop()
+
+
+def _start_timer():
+    g.request_started = time.perf_counter()
+
+
+def _route():
+    # Label by URL rule, not by path, to keep the series count bounded
+    return request.url_rule.rule if request.url_rule else "unmatched"
+
+
+def _observe(method, route, status, started):
+    REQUEST_SECONDS.labels(method, route, status).observe(time.perf_counter() - started)
+
+
+def _observe_request(response):
+    started = g.pop("request_started", None)
+    if started is not None:
+        # Observed when the server closes the response, so streamed bodies are timed in full
+        response.call_on_close(
+            partial(_observe, request.method, _route(), str(response.status_code), started)
+        )
+    return response
+
+
+def _observe_failure(exc):
+    # after_request is skipped when an exception escapes the view
+    started = g.pop("request_started", None)
+    if started is not None:
+        _observe(request.method, _route(), "500", started)
+
+
+def _cache_samples(caches, field):
+    samples = []
+    for name, cache in caches.items():
+        value = cache.stats().get(field)
+        if value is not None:
+            samples.append(({"cache": name}, value))
+    return samples
+
+
+def init_app(app, db, caches):
+    """Install request timing hooks, SQL timing listeners and scrape-time collectors.
+
+    ``caches`` maps a label to an object with a ``stats()`` method (see ``api.cache``).
+    """
+    app.before_request(_start_timer)
+    app.after_request(_observe_request)
+    app.teardown_request(_observe_failure)
+
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(Engine, "handle_error", _handle_error)
+
+    def pool_samples(field):
+        stats = pool_stats(db.engine)
+        return [({}, stats[field])] if field in stats else []
+
+    REGISTRY.gauge(
+        "api_db_pool_checked_out", "Connections in use.", lambda: pool_samples("checked_out")
+    )
+    REGISTRY.gauge(
+        "api_db_pool_overflow", "Overflow connections open.", lambda: pool_samples("overflow")
+    )
+    REGISTRY.gauge("api_db_pool_size", "Configured pool size.", lambda: pool_samples("size"))
+    REGISTRY.counter(
+        "api_db_pool_timeouts_total",
+        "Checkouts that timed out waiting for a connection.",
+        lambda: [({}, pool_timeouts.value)],
+    )
+    REGISTRY.counter(
+        "api_cache_hits_total", "Cache hits.", lambda: _cache_samples(caches, "hits")
+    )
+    REGISTRY.counter(
+        "api_cache_misses_total", "Cache misses.", lambda: _cache_samples(caches, "misses")
+    )
+    REGISTRY.gauge(
+        "api_cache_entries", "Entries currently cached.", lambda: _cache_samples(caches, "size")
+    )
+    REGISTRY.counter(
+        "api_cache_shared_hits_total",
+        "Local misses answered by the shared cache tier.",
+        lambda: _cache_samples(caches, "shared_hits"),
+    )
+    REGISTRY.counter(
+        "api_cache_coalesced_total",
+        "Lookups that waited for another caller's load instead of loading again.",
+        lambda: _cache_samples(caches, "coalesced"),
+    )
+    REGISTRY.counter(
+        "api_cache_shared_errors_total",
+        "Failed shared cache tier operations.",
+        lambda: _cache_samples(caches, "shared_errors"),
+    )
+    REGISTRY.gauge(
+        "api_cache_hit_ratio",
+        "Hits over lookups since start.",
+        lambda: _cache_samples(caches, "hit_ratio"),
+    )
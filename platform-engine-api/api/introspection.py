@@ -0,0 +1,177 @@
+import base64
+import http.client
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from urllib.parse import quote, urlencode, urlsplit
+
+from api.cache import make_cache
+from api.metrics import STAGE_SECONDS
+
+logger = logging.getLogger("auth_logger")
+
+# Introspection is enabled by configuring a confidential client allowed to call it
+INTROSPECTION_CLIENT_ID = os.getenv("INTROSPECTION_CLIENT_ID")
+INTROSPECTION_CLIENT_SECRET = os.getenv("INTROSPECTION_CLIENT_SECRET", "")
+INTROSPECTION_TIMEOUT = float(os.getenv("INTROSPECTION_TIMEOUT", "5"))
+# Parallel keep-alive connections to Keycloak, per process
+INTROSPECTION_CONCURRENCY = int(os.getenv("INTROSPECTION_CONCURRENCY", "4"))
+# Distinct tokens waiting for Keycloak; beyond this, lookups fail fast instead of queueing
+INTROSPECTION_MAX_PENDING = int(os.getenv("INTROSPECTION_MAX_PENDING", "1000"))
+# Seconds an inactive (revoked, expired or unknown) token is remembered
+INTROSPECTION_NEGATIVE_TTL = int(os.getenv("INTROSPECTION_NEGATIVE_TTL", "30"))
+INTROSPECTION_CACHE_MAX_SIZE = int(os.getenv("INTROSPECTION_CACHE_MAX_SIZE", "4096"))
+
+INTROSPECT_SECONDS = STAGE_SECONDS.labels("introspect")
+
+
+class IntrospectionUnavailable(Exception):
+    pass
+
+
+class TokenIntrospector:
+    """RFC 7662 introspection of tokens that cannot be verified locally.
+
+    Results are cached by token digest: active ones until their 'exp', inactive ones for
+    ``INTROSPECTION_NEGATIVE_TTL`` seconds. Concurrent lookups of one token share a single
+    call. Distinct tokens are sent as soon as they arrive, over a bounded pool of
+    keep-alive connections; Keycloak introspects one token per request, so a slow call
+    only holds up its own connection.
+    """
+
+    def __init__(self, endpoint, client_id, client_secret, cache=None):
+        self.endpoint = urlsplit(endpoint)
+        credentials = f"{quote(client_id, safe='')}:{quote(client_secret, safe='')}"
+        self._authorization = "Basic " + base64.b64encode(credentials.encode()).decode()
+        self.cache = cache or make_cache("introspection", maxsize=INTROSPECTION_CACHE_MAX_SIZE)
+        self.calls = 0
+        self.coalesced = 0
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._local = threading.local()
+        self._pool_pid = None
+        self._pool = None
+
+    def cached(self, cache_key):
+        return self.cache.get(cache_key)
+
+    def introspect(self, token_string, cache_key):
+        """Return Keycloak's introspection response for ``token_string``, or None on failure."""
+        result = self.cached(cache_key)
+        if result is not None:
+            return result
+        try:
+            return self.submit(token_string, cache_key).result(INTROSPECTION_TIMEOUT * 2)
+        except Exception as e:
+            logger.error("Token introspection failed for %s: %s", cache_key[:12], e)
+            return None
+
+    def submit(self, token_string, cache_key):
+        """Start a lookup and return a Future; a lookup already in flight is shared."""
+        pool = self._ensure_pool()
+        with self._pending_lock:
+            future = self._pending.get(cache_key)
+            if future is not None:
+                self.coalesced += 1
+                return future
+            if len(self._pending) >= INTROSPECTION_MAX_PENDING:
+                raise IntrospectionUnavailable("Too many pending introspection requests")
+            future = self._pending[cache_key] = Future()
+        pool.submit(self._resolve, token_string, cache_key, future)
+        return future
+
+    def stats(self):
+        stats = self.cache.stats()
+        stats.update(
+            calls=self.calls,
+            coalesced_requests=self.coalesced,
+            pending=len(self._pending),
+        )
+        return stats
+
+    def _ensure_pool(self):
+        # Threads do not survive a fork, so each worker process starts its own pool
+        if self._pool_pid == os.getpid():
+            return self._pool
+        with self._pending_lock:
+            if self._pool_pid != os.getpid():
+                self._pending = {}
+                self._local = threading.local()
+                self._pool = ThreadPoolExecutor(
+                    max_workers=INTROSPECTION_CONCURRENCY, thread_name_prefix="introspection"
+                )
+                self._pool_pid = os.getpid()
+        return self._pool
+
+    def _resolve(self, token_string, cache_key, future):
+        try:
+            result = self._call(token_string)
+            if result.get("active") and isinstance(result.get("exp"), (int, float)):
+                self.cache.set(cache_key, result, expires_at=result["exp"])
+            else:
+                result = {"active": False}
+                self.cache.set(
+                    cache_key, result, expires_at=time.time() + INTROSPECTION_NEGATIVE_TTL
+                )
+            future.set_result(result)
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            with self._pending_lock:
+                self._pending.pop(cache_key, None)
+
+    def _call(self, token_string):
+        body = urlencode({"token": token_string, "token_type_hint": "access_token"})
+        headers = {
+            "Authorization": self._authorization,
+            "Content-Type": "application/x-www-form-urlencoded",
+            "Accept": "application/json",
+        }
+        started = time.perf_counter()
+        self.calls += 1
+        try:
+            # One retry on a fresh connection: Keycloak may have closed an idle one
+            for attempt in (1, 2):
+                connection = self._connection()
+                try:
+                    connection.request("POST", self.endpoint.path, body, headers)
+                    response = connection.getresponse()
+                    payload = response.read()
+                    break
+                except (OSError, http.client.HTTPException):
+                    connection.close()
+                    self._local.connection = None
+                    if attempt == 2:
+                        raise
+        finally:
+            INTROSPECT_SECONDS.observe(time.perf_counter() - started)
+        if response.status != 200:
+            raise IntrospectionUnavailable(f"Introspection endpoint returned {response.status}")
+        return json.loads(payload)
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            if self.endpoint.scheme == "https":
+                connection_class = http.client.HTTPSConnection
+            else:
+                connection_class = http.client.HTTPConnection
+            connection = connection_class(
+                self.endpoint.hostname, self.endpoint.port, timeout=INTROSPECTION_TIMEOUT
+            )
+            self._local.connection = connection
+        return connection
+
+
+def create_introspector(issuer):
+    """A ``TokenIntrospector`` for the realm, or None when no introspection client is set."""
+    if not INTROSPECTION_CLIENT_ID:
+        return None
+    return TokenIntrospector(
+        f"{issuer}/protocol/openid-connect/token/introspect",
+        INTROSPECTION_CLIENT_ID,
+        INTROSPECTION_CLIENT_SECRET,
+    )
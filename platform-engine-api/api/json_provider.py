@@ -0,0 +1,71 @@
+import os
+import time
+
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.local import LocalProxy
+
+from api.metrics import STAGE_SECONDS
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is an optional extra
+    orjson = None
+
+# "orjson" (falls back to "default" when orjson is not installed) or "default"
+API_JSON_PROVIDER = os.getenv("API_JSON_PROVIDER", "orjson")
+
+SERIALIZE_SECONDS = STAGE_SECONDS.labels("serialize")
+
+
+def _default(o):
+    # current_token and friends are proxies around plain dicts
+    if isinstance(o, LocalProxy):
+        return o._get_current_object()
+    return DefaultJSONProvider.default(o)
+
+
+class StdlibJSONProvider(DefaultJSONProvider):
+    """Flask's provider, extended to serialize werkzeug proxies."""
+
+    default = staticmethod(_default)
+
+    def response(self, *args, **kwargs):
+        started = time.perf_counter()
+        response = super().response(*args, **kwargs)
+        SERIALIZE_SECONDS.observe(time.perf_counter() - started)
+        return response
+
+
+class OrjsonProvider(StdlibJSONProvider):
+    """JSON provider backed by orjson; dataclasses and dicts are encoded natively in C.
+
+    Keys are emitted in insertion order and ``dumps`` kwargs other than ``default`` fall
+    back to the stdlib implementation.
+    """
+
+    option = orjson.OPT_NON_STR_KEYS if orjson else 0
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self.option).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        started = time.perf_counter()
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(
+            obj, default=self.default, option=self.option | orjson.OPT_APPEND_NEWLINE
+        )
+        SERIALIZE_SECONDS.observe(time.perf_counter() - started)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def get_json_provider_class(name=API_JSON_PROVIDER):
+    if name == "orjson" and orjson is not None:
+        return OrjsonProvider
+    return StdlibJSONProvider
@@ -0,0 +1,178 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from urllib.request import urlopen
+
+from authlib.jose.rfc7517.jwk import JsonWebKey
+
+logger = logging.getLogger("auth_logger")
+
+JWKS_FETCH_TIMEOUT = float(os.getenv("JWKS_FETCH_TIMEOUT", "5"))
+JWKS_REFRESH_DEFAULT = int(os.getenv("JWKS_REFRESH_DEFAULT", "300"))
+JWKS_REFRESH_MIN = int(os.getenv("JWKS_REFRESH_MIN", "60"))
+JWKS_REFRESH_MAX = int(os.getenv("JWKS_REFRESH_MAX", "3600"))
+# Minimum spacing between fetches triggered by an unknown 'kid'
+JWKS_MISS_REFETCH_INTERVAL = int(os.getenv("JWKS_MISS_REFETCH_INTERVAL", "30"))
+JWKS_FALLBACK_FILE = os.getenv("JWKS_FALLBACK_FILE")
+
+_MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+
+def _max_age(cache_control):
+    if not cache_control or "no-cache" in cache_control or "no-store" in cache_control:
+        return None
+    match = _MAX_AGE_RE.search(cache_control)
+    return int(match.group(1)) if match else None
+
+
+class JWKSManager:
+    """Holds the realm signing keys indexed by 'kid' and keeps them fresh in the background."""
+
+    def __init__(self, jwks_url, fallback_file=JWKS_FALLBACK_FILE, shared_cache=None):
+        self.jwks_url = jwks_url
+        self.fallback_file = fallback_file
+        # Optional cache (see api.cache.make_cache) through which workers share fetched keys
+        self.shared_cache = shared_cache
+        self.keys = {}
+        self.loaded = False
+        self.last_fetch = 0.0
+        self.last_attempt = None
+        self.next_refresh = 0.0
+        self.fetch_count = 0
+        self._fetch_lock = threading.Lock()
+        self._refresher_pid = None
+
+    def load(self):
+        """Load keys from the shared cache or the fallback file, otherwise from Keycloak."""
+        if not self.load_stored():
+            self.refresh()
+        self.loaded = True
+
+    def load_stored(self):
+        """Install keys fetched earlier by any worker; False when none are available."""
+        if self.shared_cache is not None:
+            entry = self.shared_cache.get("keys")
+            if entry is not None:
+                self._install(entry["jwks"])
+                # Refresh when the worker that fetched them would have
+                self.next_refresh = time.monotonic() + max(entry["refresh_at"] - time.time(), 0)
+                logger.info("Loaded %d JWKS keys from the shared cache", len(self.keys))
+                return True
+        if self.fallback_file and os.path.exists(self.fallback_file):
+            try:
+                with open(self.fallback_file) as f:
+                    self._install(json.load(f))
+                logger.info("Loaded %d JWKS keys from %s", len(self.keys), self.fallback_file)
+                return True
+            except (OSError, ValueError) as e:
+                logger.warning("Ignoring unreadable JWKS fallback file %s: %s", self.fallback_file, e)
+        return False
+
+    def refresh(self):
+        """Fetch the key set once; concurrent callers wait for the in-flight fetch."""
+        started = time.monotonic()
+        with self._fetch_lock:
+            # Another thread refreshed while we were waiting for the lock
+            if self.last_fetch and self.last_fetch >= started:
+                return
+            self.last_attempt = time.monotonic()
+            with urlopen(self.jwks_url, timeout=JWKS_FETCH_TIMEOUT) as response:
+                jwks = json.loads(response.read())
+                cache_control = response.headers.get("Cache-Control")
+            self.apply_fetched(jwks, cache_control)
+        self.write_fallback(jwks)
+
+    def apply_fetched(self, jwks, cache_control=None):
+        """Install a freshly fetched key set and schedule the next refresh from its max-age."""
+        self._install(jwks)
+        self.fetch_count += 1
+        self.last_fetch = time.monotonic()
+        max_age = _max_age(cache_control)
+        interval = JWKS_REFRESH_DEFAULT if max_age is None else max_age
+        interval = min(max(interval, JWKS_REFRESH_MIN), JWKS_REFRESH_MAX)
+        self.next_refresh = self.last_fetch + interval
+        logger.info("Fetched %d JWKS keys from %s", len(self.keys), self.jwks_url)
+        if self.shared_cache is not None:
+            refresh_at = time.time() + interval
+            # Kept past refresh_at so a worker starting late still finds keys to begin with
+            self.shared_cache.set(
+                "keys", {"jwks": jwks, "refresh_at": refresh_at}, expires_at=refresh_at + interval
+            )
+
+    def get_key(self, kid):
+        if not self.loaded and self.may_fetch():
+            # First use in a lazily started process; errors surface as an unknown kid
+            try:
+                self.load()
+            except Exception as e:
+                logger.error("Failed to load JWKS: %s", e)
+        self._ensure_refresher()
+        key = self.lookup(kid)
+        if key is None and self.may_fetch():
+            logger.info("Unknown JWKS kid %s, refreshing key set", kid)
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error("Failed to refresh JWKS for kid %s: %s", kid, e)
+            key = self.lookup(kid)
+        return key
+
+    def load_key(self, header, payload):
+        """Key resolver for ``authlib.jose.jwt.decode``."""
+        key = self.get_key(header.get("kid"))
+        if key is None:
+            raise ValueError(f"No signing key found for kid {header.get('kid')!r}")
+        return key
+
+    def may_fetch(self):
+        if self.last_attempt is None:
+            return True
+        return time.monotonic() - self.last_attempt >= JWKS_MISS_REFETCH_INTERVAL
+
+    def lookup(self, kid):
+        keys = self.keys
+        if kid is None and len(keys) == 1:
+            return next(iter(keys.values()))
+        return keys.get(kid)
+
+    def _install(self, jwks):
+        keys = {}
+        for jwk in jwks.get("keys", []):
+            if jwk.get("use", "sig") != "sig":
+                continue
+            keys[jwk.get("kid")] = JsonWebKey.import_key(jwk)
+        # Swap the whole mapping so readers never observe a partial key set
+        self.keys = keys
+
+    def write_fallback(self, jwks):
+        if not self.fallback_file:
+            return
+        tmp_path = f"{self.fallback_file}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(jwks, f)
+            os.replace(tmp_path, self.fallback_file)
+        except OSError as e:
+            logger.warning("Could not write JWKS fallback file %s: %s", self.fallback_file, e)
+
+    def _ensure_refresher(self):
+        # Threads do not survive a fork, so each worker process starts its own
+        if self._refresher_pid == os.getpid():
+            return
+        with self._fetch_lock:
+            if self._refresher_pid == os.getpid():
+                return
+            self._refresher_pid = os.getpid()
+        thread = threading.Thread(target=self._refresh_loop, name="jwks-refresh", daemon=True)
+        thread.start()
+
+    def _refresh_loop(self):
+        while True:
+            time.sleep(max(self.next_refresh - time.monotonic(), JWKS_REFRESH_MIN))
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error("Background JWKS refresh failed: %s", e)
@@ -1,29 +1,134 @@
+import atexit
+import json
 import logging
 import os
-from logging.handlers import RotatingFileHandler
+import queue
+import random
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
 from api import BASE_DIR
 
 DEFAULT_LOG_FILE_PATH = f"{BASE_DIR}/logs/api.log"
 
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+# Per-logger overrides, e.g. "auth_logger=DEBUG,sqlalchemy.engine=INFO"
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+# "text" or "json" (one JSON object per line)
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+# Optional rotating log file, written by the listener thread
+LOG_FILE = os.getenv("LOG_FILE")
+# Fraction of DEBUG records kept; DEBUG lines sit on hot paths
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "1.0"))
+# Records beyond this backlog are dropped rather than blocking the request thread
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
 
-def setup_logger(log_file_path=DEFAULT_LOG_FILE_PATH):
+TEXT_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+
+_lock = threading.Lock()
+_listener = None
+
+
+class JsonLinesFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class DebugSamplingFilter(logging.Filter):
+    """Keeps a random ``rate`` fraction of DEBUG records and every record above DEBUG."""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno > logging.DEBUG or random.random() < self.rate
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Hands records to the listener thread without formatting them first."""
+
+    dropped = 0
+
+    def prepare(self, record):
+        # Formatting (and %-interpolation of args) happens on the listener thread
+        return record
 
-    logger = logging.getLogger("my_app_logger")
-    logger.setLevel(logging.DEBUG)
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            NonBlockingQueueHandler.dropped += 1
 
-    formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
 
-    console_handler = logging.StreamHandler()
-    console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
+def _parse_levels(spec):
+    levels = {}
+    for part in spec.split(","):
+        name, _, level = part.strip().partition("=")
+        if name and level:
+            levels[name.strip()] = level.strip().upper()
+    return levels
 
-    # Log to a local file
-    logs_dir = os.path.dirname(log_file_path)
-    os.makedirs(logs_dir, exist_ok=True)
 
-    file_handler = RotatingFileHandler(log_file_path, maxBytes=5 * 1024 * 1024, backupCount=2)
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
+def _build_handlers(log_file_path):
+    formatter = JsonLinesFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT)
+    handlers = [logging.StreamHandler()]
+    if log_file_path:
+        os.makedirs(os.path.dirname(log_file_path), exist_ok=True)
+        handlers.append(
+            RotatingFileHandler(log_file_path, maxBytes=5 * 1024 * 1024, backupCount=2)
+        )
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    return handlers
 
-    return logger
+
+def _start_listener(log_queue, handlers):
+    global _listener
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def configure_logging(log_file_path=LOG_FILE):
+    """Route all records through a bounded queue to a background listener thread.
+
+    Safe to call more than once; only the first call installs the pipeline.
+    """
+    with _lock:
+        if _listener is not None:
+            return
+        log_queue = queue.Queue(LOG_QUEUE_SIZE)
+        queue_handler = NonBlockingQueueHandler(log_queue)
+        if LOG_DEBUG_SAMPLE_RATE < 1.0:
+            queue_handler.addFilter(DebugSamplingFilter(LOG_DEBUG_SAMPLE_RATE))
+
+        root = logging.getLogger()
+        root.setLevel(LOG_LEVEL.upper())
+        root.addHandler(queue_handler)
+        for name, level in _parse_levels(LOG_LEVELS).items():
+            logging.getLogger(name).setLevel(level)
+
+        handlers = _build_handlers(log_file_path)
+        _start_listener(log_queue, handlers)
+        atexit.register(lambda: _listener.stop())
+
+        def restart_in_child():
+            # The listener thread does not survive fork(), so each worker gets a fresh
+            # queue (its lock may have been held mid-fork) and its own listener
+            queue_handler.queue = queue.Queue(LOG_QUEUE_SIZE)
+            _start_listener(queue_handler.queue, handlers)
+
+        os.register_at_fork(after_in_child=restart_in_child)
+
+
+def setup_logger(log_file_path=DEFAULT_LOG_FILE_PATH):
+    configure_logging(log_file_path)
+    return logging.getLogger("my_app_logger")
@@ -0,0 +1,149 @@
+import bisect
+import threading
+
+# Seconds; roughly exponential from 0.5ms to 10s
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class Histogram:
+    """Fixed-bucket histogram; ``observe`` is a bisect plus two additions under a lock."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self):
+        """Cumulative bucket counts keyed by upper bound, plus sum and count."""
+        with self._lock:
+            counts = list(self.counts)
+            total, count = self.sum, self.count
+        cumulative = {}
+        running = 0
+        for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+            running += bucket_count
+            cumulative[str(bound)] = running
+        return {"buckets": cumulative, "sum": total, "count": count}
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class HistogramFamily:
+    """A named histogram with optional labels, rendered in Prometheus text format."""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, Histogram(self.buckets))
+        return child
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def collect(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for values, child in list(self._children.items()):
+            snapshot = child.snapshot()
+            for bound, count in snapshot["buckets"].items():
+                le = _labels(self.labelnames, values, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{le} {count}")
+            labels = _labels(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {snapshot['sum']}")
+            lines.append(f"{self.name}_count{labels} {snapshot['count']}")
+        return lines
+
+
+class CallbackMetric:
+    """Gauge or counter whose samples are read from ``callback`` at scrape time.
+
+    ``callback`` returns an iterable of ``(labels_dict, value)`` pairs.
+    """
+
+    def __init__(self, name, documentation, kind, callback):
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind
+        self.callback = callback
+
+    def collect(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for labels, value in self.callback():
+            lines.append(f"{self.name}{_labels(labels.keys(), labels.values())} {value}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        # Re-registering a name replaces it, e.g. when several apps are created in a process
+        self._metrics[metric.name] = metric
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(HistogramFamily(name, documentation, labelnames, buckets))
+
+    def gauge(self, name, documentation, callback):
+        return self.register(CallbackMetric(name, documentation, "gauge", callback))
+
+    def counter(self, name, documentation, callback):
+        return self.register(CallbackMetric(name, documentation, "counter", callback))
+
+    def render(self):
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    "api_request_duration_seconds", "Request latency by route.", ("method", "route", "status")
+)
+STAGE_SECONDS = REGISTRY.histogram(
+    "api_stage_duration_seconds",
+    "Time spent in request stages (jwt_verify, verify_user_db, serialize).",
+    ("stage",),
+)
+DB_QUERY_SECONDS = REGISTRY.histogram(
+    "api_db_query_duration_seconds", "SQL statement latency by operation.", ("operation",)
+)
@@ -0,0 +1,102 @@
+"""Versioned schema migrations (Alembic, see ``migrations/``).
+
+Run ``python -m api.migrate`` once per deploy, before the workers start; workers only check
+that the database is at the latest revision.
+"""
+
+import argparse
+import logging
+import os
+import sys
+
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import create_engine
+
+from api.models import db
+
+logger = logging.getLogger("startup_logger")
+
+DATABASE_URI = os.getenv(
+    "SQLALCHEMY_DATABASE_URI", "postgresql://user:password@db:5432/mydatabase"
+)
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "migrations")
+# Schema step of each worker's warm-up. check: fail until the database is at the latest
+# revision, create_all: create missing tables without migrations (throwaway databases),
+# off: skip the step
+API_SCHEMA_MODE = os.getenv("API_SCHEMA_MODE", "check")
+
+
+class SchemaOutdated(Exception):
+    pass
+
+
+def alembic_config(database_uri=DATABASE_URI):
+    config = Config()
+    config.set_main_option("script_location", MIGRATIONS_DIR)
+    # Passed as an attribute: ini values would treat '%' in passwords as interpolation
+    config.attributes["database_uri"] = database_uri
+    return config
+
+
+def head_revisions(config=None):
+    return set(ScriptDirectory.from_config(config or alembic_config()).get_heads())
+
+
+def current_revisions(connection):
+    return set(MigrationContext.configure(connection).get_current_heads())
+
+
+def check_schema(connection):
+    """Raise ``SchemaOutdated`` unless the database is at the latest revision."""
+    current, heads = current_revisions(connection), head_revisions()
+    if current != heads:
+        raise SchemaOutdated(
+            f"Database schema is at {', '.join(sorted(current)) or 'no revision'}, expected "
+            f"{', '.join(sorted(heads))}; run 'python -m api.migrate'"
+        )
+
+
+def prepare_schema(connection, mode=API_SCHEMA_MODE):
+    """The warm-up schema step; a single query in the default ``check`` mode."""
+    if mode == "check":
+        check_schema(connection)
+    elif mode == "create_all":
+        db.metadata.create_all(connection)
+    elif mode != "off":
+        raise ValueError(f"Unknown API_SCHEMA_MODE {mode!r}")
+
+
+def upgrade(database_uri=DATABASE_URI, revision="head"):
+    command.upgrade(alembic_config(database_uri), revision)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate the database schema.")
+    parser.add_argument("revision", nargs="?", default="head", help="Target revision")
+    parser.add_argument("--database-url", default=DATABASE_URI)
+    parser.add_argument(
+        "--check", action="store_true", help="Exit non-zero if migrations are pending"
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+
+    if args.check:
+        engine = create_engine(args.database_url)
+        try:
+            with engine.connect() as connection:
+                check_schema(connection)
+        except SchemaOutdated as e:
+            logger.error("%s", e)
+            sys.exit(1)
+        finally:
+            engine.dispose()
+        logger.info("Database schema is up to date")
+        return
+    upgrade(args.database_url, args.revision)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,27 @@
 import logging
+import os
+import time
+from datetime import datetime, timezone
 
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import Column, Integer, String
-from sqlalchemy.orm.exc import MultipleResultsFound, NoResultFound
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String, func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
 
-db = SQLAlchemy()
+from api.cache import make_cache
+from api.metrics import STAGE_SECONDS
+from api.replicas import RoutingSession, mark_written
+
+# SELECTs may go to a read replica, see api.replicas
+db = SQLAlchemy(session_options={"class_": RoutingSession})
+
+# Maps a token's 'sub' to the local user id
+USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", "300"))
+USER_CACHE_MAX_SIZE = int(os.getenv("USER_CACHE_MAX_SIZE", "10000"))
+user_cache = make_cache("user", maxsize=USER_CACHE_MAX_SIZE, ttl=USER_CACHE_TTL)
+
+_UPSERT_DIALECTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+VERIFY_USER_DB_SECONDS = STAGE_SECONDS.labels("verify_user_db")
 
 
 class User(db.Model):
@@ -12,27 +29,127 @@ class User(db.Model):
     id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(String)
     username = Column(String)
-    email = Column(String)
+    # Keycloak's stable subject id; email and names are attributes that may change
+    sub = Column(String, unique=True, index=True)
+    email = Column(String, index=True)
+    # Bumped in the same transaction as every change to the user's items; drives ETags
+    items_version = Column(Integer, nullable=False, default=0, server_default="0")
+    items_modified_at = Column(DateTime(timezone=True))
 
 
 class Item(db.Model):
     __tablename__ = "items"
+    # Serves keyset pagination: WHERE owner_id = ? AND id > ? ORDER BY id
+    __table_args__ = (Index("ix_items_owner_id_id", "owner_id", "id"),)
     id = Column(Integer, primary_key=True, autoincrement=True)
+    owner_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     name = Column(String)
 
 
+def user_cache_key(token):
+    return token["sub"]
+
+
+def claim_user_stmt(token):
+    """UPDATE that gives a row created before users had a 'sub' to the token's subject.
+
+    Matched by email, as those rows were; a no-op once every such row has been claimed.
+    """
+    return (
+        update(User)
+        .where(User.sub.is_(None), User.email == token["email"])
+        .values(sub=token["sub"])
+    )
+
+
+def upsert_user_stmt(dialect_name, token):
+    """INSERT ... ON CONFLICT (sub) DO UPDATE ... RETURNING id for the user behind ``token``."""
+    insert = _UPSERT_DIALECTS[dialect_name]
+    stmt = insert(User).values(
+        sub=token["sub"],
+        email=token.get("email"),
+        name=token.get("name"),
+        username=token.get("preferred_username"),
+    )
+    # A single round trip that is safe under concurrent first logins
+    return stmt.on_conflict_do_update(
+        index_elements=[User.sub],
+        set_={
+            # Tokens without the email scope leave the stored address alone
+            "email": func.coalesce(stmt.excluded.email, User.email),
+            "name": stmt.excluded.name,
+            "username": stmt.excluded.username,
+        },
+    ).returning(User.id)
+
+
+def user_items_stmt(owner_id, after_id=None):
+    stmt = select(Item.id, Item.name).where(Item.owner_id == owner_id)
+    if after_id is not None:
+        stmt = stmt.where(Item.id > after_id)
+    return stmt.order_by(Item.id)
+
+
+def bump_items_version_stmt(owner_id):
+    return (
+        update(User)
+        .where(User.id == owner_id)
+        .values(
+            items_version=User.items_version + 1,
+            items_modified_at=datetime.now(timezone.utc),
+        )
+    )
+
+
+def items_version_stmt(owner_id):
+    return select(User.items_version, User.items_modified_at).where(User.id == owner_id)
+
+
 def verify_user(token: dict):
+    """Return the id of the user behind ``token``, creating the user on first sight."""
+    if not token.get("sub"):
+        return None
+    # Concurrent first requests of one user share a single upsert
+    return user_cache.get_or_set(user_cache_key(token), lambda: _upsert_user(token))
+
+
+def _upsert_user(token):
+    stmt = upsert_user_stmt(db.session.get_bind().dialect.name, token)
+    started = time.perf_counter()
     try:
-        user = db.session.query(User).filter(User.email == token["email"]).one()
-    except NoResultFound:
-        user = User(email=token["email"], name=token["name"], username=token["preferred_username"])
-        db.session.add(user)
+        if token.get("email"):
+            db.session.execute(claim_user_stmt(token))
+        user_id = db.session.execute(stmt).scalar_one()
+        # Marked before the commit so no read can slip past it to a lagging replica
+        mark_written(user_id)
         db.session.commit()
-    except MultipleResultsFound:
-        logging.error(f"Multiple users found for email: {token['email']}")
-        # Handle multiple users with the same email (if this is not expected)
     except Exception as e:
-        logging.error(f"Error while verifying user: {e}")
-        # Handle other exceptions (log, raise, or handle as appropriate)
+        db.session.rollback()
+        logging.error("Error while verifying user: %s", e)
+        return None
     finally:
-        db.session.close()
\ No newline at end of file
+        VERIFY_USER_DB_SECONDS.observe(time.perf_counter() - started)
+    return user_id
+
+
+def list_user_items(owner_id, after_id=None, limit=50):
+    """Return up to ``limit`` (id, name) rows after ``after_id`` and whether more exist."""
+    rows = db.session.execute(user_items_stmt(owner_id, after_id).limit(limit + 1)).all()
+    return rows[:limit], len(rows) > limit
+
+
+def iter_user_items(owner_id, after_id=None, batch_size=1000):
+    """Iterate all (id, name) rows of an owner through a server-side cursor."""
+    stmt = user_items_stmt(owner_id, after_id).execution_options(yield_per=batch_size)
+    return db.session.execute(stmt)
+
+
+def get_items_version(owner_id):
+    """Return ``(items_version, items_modified_at)`` for an owner, a primary key lookup."""
+    if db.session.info.get("replica"):
+        row = db.session.execute(items_version_stmt(owner_id)).one_or_none()
+        if row is not None:
+            return row
+        # A replica lagging past the read-your-writes window has not seen the user yet
+        db.session.info["replica"] = None
+    return db.session.execute(items_version_stmt(owner_id)).one()
@@ -0,0 +1,42 @@
+import base64
+import os
+
+ITEMS_PAGE_DEFAULT = int(os.getenv("ITEMS_PAGE_DEFAULT", "50"))
+ITEMS_PAGE_MAX = int(os.getenv("ITEMS_PAGE_MAX", "500"))
+
+_CURSOR_VERSION = "v1"
+
+
+class InvalidPageRequest(ValueError):
+    pass
+
+
+def encode_cursor(last_id):
+    """Opaque, URL-safe cursor pointing just after ``last_id``."""
+    raw = f"{_CURSOR_VERSION}:{last_id}".encode("ascii")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        version, last_id = base64.urlsafe_b64decode(padded).decode("ascii").split(":", 1)
+        if version != _CURSOR_VERSION:
+            raise ValueError(version)
+        return int(last_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidPageRequest(f"Invalid cursor: {cursor}") from e
+
+
+def parse_limit(value):
+    if value is None or value == "":
+        return ITEMS_PAGE_DEFAULT
+    try:
+        limit = int(value)
+    except ValueError as e:
+        raise InvalidPageRequest(f"Invalid limit: {value}") from e
+    if limit < 1:
+        raise InvalidPageRequest(f"Invalid limit: {value}")
+    return min(limit, ITEMS_PAGE_MAX)
@@ -0,0 +1,125 @@
+import json
+import logging
+import os
+
+logger = logging.getLogger("auth_logger")
+
+# JSON file mapping policy names to required scopes, roles and authorized parties
+API_POLICY_FILE = os.getenv("API_POLICY_FILE")
+# Authorized parties ('azp') accepted when the policy file does not say otherwise
+API_ALLOWED_AZP = os.getenv("API_ALLOWED_AZP", "client-web")
+
+# Route policies of the API; by default they only require what "default" requires
+DEFAULT_POLICIES = {"policies": {"items:read": {}, "items:write": {}}}
+
+# Reasons a token can fail a policy; "azp" means the token was issued to another client
+AZP_DENIED = "azp"
+SCOPE_DENIED = "scope"
+ROLE_DENIED = "role"
+
+
+class PolicyError(ValueError):
+    pass
+
+
+class Grants:
+    """Scopes and roles of one token as sets, computed once when the token is verified.
+
+    Realm roles are kept as is, client roles as ``<client>:<role>``.
+    """
+
+    __slots__ = ("azp", "scopes", "roles")
+
+    def __init__(self, claims):
+        self.azp = claims.get("azp")
+        scope = claims.get("scope")
+        self.scopes = frozenset(scope.split()) if isinstance(scope, str) else frozenset()
+        roles = set((claims.get("realm_access") or {}).get("roles") or ())
+        for client, access in (claims.get("resource_access") or {}).items():
+            roles.update(f"{client}:{role}" for role in (access or {}).get("roles") or ())
+        self.roles = frozenset(roles)
+
+
+class Policy:
+    """A compiled policy: every check is one set-membership or subset test."""
+
+    __slots__ = ("name", "azp", "scopes", "roles")
+
+    def __init__(self, name, azp, scopes, roles):
+        self.name = name
+        self.azp = azp
+        self.scopes = scopes
+        self.roles = roles
+
+    def denial(self, grants):
+        """Return why ``grants`` fail this policy, or None when they satisfy it."""
+        if self.azp is not None and grants.azp not in self.azp:
+            return AZP_DENIED
+        if not self.scopes <= grants.scopes:
+            return SCOPE_DENIED
+        if not self.roles <= grants.roles:
+            return ROLE_DENIED
+        return None
+
+
+class PolicySet:
+    """Named policies compiled from a declarative spec.
+
+    Each named policy adds its requirements to the ``default`` one, which also applies to
+    routes protected without a policy name. ``default.azp`` falls back to API_ALLOWED_AZP::
+
+        {
+          "default": {"azp": ["client-web"]},
+          "policies": {
+            "items:read": {"scopes": ["items:read"]},
+            "items:write": {"scopes": ["items:write"], "roles": ["items-writer"]}
+          }
+        }
+    """
+
+    def __init__(self, spec):
+        default_rules = {"azp": API_ALLOWED_AZP.split(","), **(spec.get("default") or {})}
+        default = _compile("default", default_rules, None)
+        self.default = default
+        self.policies = {
+            name: _compile(name, rules, default)
+            for name, rules in (spec.get("policies") or {}).items()
+        }
+
+    def get(self, name):
+        if name is None:
+            return self.default
+        try:
+            return self.policies[name]
+        except KeyError:
+            raise PolicyError(f"Unknown policy {name!r}") from None
+
+    def require(self, *names):
+        """Fail at startup, not per request, when a route names an undefined policy."""
+        for name in names:
+            self.get(name)
+
+
+def _compile(name, rules, base):
+    unknown = set(rules) - {"azp", "scopes", "roles"}
+    if unknown:
+        raise PolicyError(f"Policy {name!r} has unknown keys: {', '.join(sorted(unknown))}")
+    azp = frozenset(rules["azp"]) if "azp" in rules else None
+    scopes = frozenset(rules.get("scopes", ()))
+    roles = frozenset(rules.get("roles", ()))
+    if base is not None:
+        # A named policy narrows the default azp list if it sets one
+        azp = azp if azp is not None else base.azp
+        scopes |= base.scopes
+        roles |= base.roles
+    return Policy(name, azp, scopes, roles)
+
+
+def load_policies(path=API_POLICY_FILE):
+    if not path:
+        return PolicySet(DEFAULT_POLICIES)
+    with open(path) as f:
+        spec = json.load(f)
+    policies = PolicySet(spec)
+    logger.info("Loaded %d policies from %s", len(policies.policies), path)
+    return policies
@@ -0,0 +1,67 @@
+import os
+import random
+
+from flask_sqlalchemy.session import Session
+
+from api.cache import make_cache
+from api.database import engine_options
+
+# Comma separated read replicas of SQLALCHEMY_DATABASE_URI; unset sends everything to it
+SQLALCHEMY_REPLICA_URIS = [
+    uri.strip() for uri in os.getenv("SQLALCHEMY_REPLICA_URIS", "").split(",") if uri.strip()
+]
+# Seconds after a user's own write during which their reads stay on the primary.
+# Keep it above the replication lag you expect
+REPLICA_READ_YOUR_WRITES_SECONDS = float(os.getenv("REPLICA_READ_YOUR_WRITES_SECONDS", "5"))
+RECENT_WRITERS_MAX_SIZE = int(os.getenv("RECENT_WRITERS_MAX_SIZE", "10000"))
+
+REPLICA_BIND_KEYS = [f"replica_{index}" for index in range(len(SQLALCHEMY_REPLICA_URIS))]
+
+# Shared across workers with the cache's Redis tier, so a write in one worker pins the
+# writer's next reads in every worker
+recent_writers = make_cache(
+    "recent_writers", maxsize=RECENT_WRITERS_MAX_SIZE, ttl=REPLICA_READ_YOUR_WRITES_SECONDS
+)
+
+
+class RoutingSession(Session):
+    """Sends SELECTs to the replica picked by ``route_reads``; everything else, including
+    flushes and raw connections (e.g. COPY), to the primary."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        replica = self.info.get("replica")
+        if (
+            replica is not None
+            and bind is None
+            and not self._flushing
+            and getattr(clause, "is_select", False)
+        ):
+            return self._db.engines[replica]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def replica_binds():
+    """SQLALCHEMY_BINDS entries for the replicas, pooled like the primary."""
+    return {
+        key: {"url": uri, **engine_options(uri)}
+        for key, uri in zip(REPLICA_BIND_KEYS, SQLALCHEMY_REPLICA_URIS)
+    }
+
+
+def mark_written(owner_id):
+    """Record that ``owner_id`` just wrote, keeping their reads on the primary for a while."""
+    if REPLICA_BIND_KEYS:
+        recent_writers.set(str(owner_id), True)
+
+
+def read_replica(owner_id):
+    """The bind key ``owner_id``'s reads may use, or None for the primary."""
+    if not REPLICA_BIND_KEYS or recent_writers.get(str(owner_id)):
+        return None
+    return random.choice(REPLICA_BIND_KEYS)
+
+
+def route_reads(session, owner_id):
+    """Route the rest of ``session``'s SELECTs for ``owner_id`` to a replica when allowed."""
+    session.info["replica"] = read_replica(owner_id)
+    return session.info["replica"]
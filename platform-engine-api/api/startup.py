@@ -0,0 +1,73 @@
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger("startup_logger")
+
+# eager: warm up while the app is created, background: warm up in a thread,
+# lazy: warm up on the first request (or from a pre-fork server hook)
+API_STARTUP_MODE = os.getenv("API_STARTUP_MODE", "lazy")
+# Seconds to wait before a failed warm-up is attempted again
+WARMUP_RETRY_INTERVAL = float(os.getenv("WARMUP_RETRY_INTERVAL", "5"))
+
+
+class WarmUp:
+    """Runs the one-off startup steps (schema check, key loading) exactly once."""
+
+    def __init__(self, steps, mode=API_STARTUP_MODE):
+        self.steps = steps
+        self.mode = mode
+        self.timings = {}
+        self.ready = False
+        self.error = None
+        self.created_at = time.monotonic()
+        self.ready_after = None
+        self._last_attempt = None
+        self._lock = threading.Lock()
+
+    def run(self):
+        if self.ready:
+            return True
+        with self._lock:
+            if self.ready:
+                return True
+            if (
+                self._last_attempt is not None
+                and time.monotonic() - self._last_attempt < WARMUP_RETRY_INTERVAL
+            ):
+                return False
+            self._last_attempt = time.monotonic()
+            for name, step in self.steps:
+                if name in self.timings:
+                    continue
+                started = time.perf_counter()
+                try:
+                    step()
+                except Exception as e:
+                    self.error = f"{name}: {e}"
+                    logger.error("Warm-up step '%s' failed: %s", name, e)
+                    return False
+                self.timings[name] = round((time.perf_counter() - started) * 1000, 2)
+            self.error = None
+            self.ready = True
+            self.ready_after = round((time.monotonic() - self.created_at) * 1000, 2)
+            logger.info("API warm-up finished in %sms %s", self.ready_after, self.timings)
+            return True
+
+    def start_background(self):
+        """Warm up in a daemon thread unless warm-up is done or already in progress."""
+        if self.ready or self._lock.locked():
+            return None
+        thread = threading.Thread(target=self.run, name="api-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def status(self):
+        return {
+            "ready": self.ready,
+            "mode": self.mode,
+            "ready_after_ms": self.ready_after,
+            "steps_ms": dict(self.timings),
+            "error": self.error,
+        }
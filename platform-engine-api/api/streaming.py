@@ -0,0 +1,42 @@
+import os
+
+from flask import current_app
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+JSON_MIMETYPE = "application/json"
+
+# Rows serialized per chunk written to the socket
+STREAM_CHUNK_ROWS = int(os.getenv("STREAM_CHUNK_ROWS", "500"))
+
+
+def negotiate_stream_mimetype(accept_mimetypes):
+    """Pick NDJSON when the client prefers it, otherwise a chunked JSON array."""
+    best = accept_mimetypes.best_match([JSON_MIMETYPE, NDJSON_MIMETYPE])
+    return NDJSON_MIMETYPE if best == NDJSON_MIMETYPE else JSON_MIMETYPE
+
+
+def stream_ndjson(objects, chunk_rows=STREAM_CHUNK_ROWS):
+    dumps = current_app.json.dumps
+    chunk = []
+    for obj in objects:
+        chunk.append(dumps(obj))
+        if len(chunk) >= chunk_rows:
+            yield "\n".join(chunk) + "\n"
+            chunk = []
+    if chunk:
+        yield "\n".join(chunk) + "\n"
+
+
+def stream_json_array(key, objects, chunk_rows=STREAM_CHUNK_ROWS):
+    """Yield ``{"<key>": [...]}`` incrementally, ``chunk_rows`` objects at a time."""
+    dumps = current_app.json.dumps
+    yield "{" + dumps(key) + ":["
+    separator = ""
+    chunk = []
+    for obj in objects:
+        chunk.append(dumps(obj))
+        if len(chunk) >= chunk_rows:
+            yield separator + ",".join(chunk)
+            separator = ","
+            chunk = []
+    yield (separator + ",".join(chunk) if chunk else "") + "]}"
@@ -0,0 +1,5 @@
+"""Production WSGI entry point: ``gunicorn -c gunicorn.conf.py api.wsgi:app``."""
+
+from api.app import app, warm_up
+
+__all__ = ["app", "warm_up"]
@@ -0,0 +1,111 @@
+"""Serialization benchmark for the API's JSON providers.
+
+Compares the stdlib-backed provider with the orjson provider on item listings of 10 to
+100k ``ItemDTO`` entries and on a decoded token claims dict. Throughput is measured with
+``timeit`` and allocations with ``tracemalloc`` (peak bytes for a single dump).
+
+A ``slots=True`` variant of the DTO is included because orjson only takes its fast path
+for dataclasses that have a ``__dict__``; slotted DTOs serialize several times slower.
+
+Usage: poetry run python -m benchmarks.bench_serialization [--output results.json]
+"""
+
+import argparse
+import json
+import sys
+import timeit
+import tracemalloc
+from dataclasses import dataclass
+
+from flask import Flask
+
+from api.dtos import ItemDTO
+from api.json_provider import OrjsonProvider, StdlibJSONProvider, orjson
+
+SIZES = [10, 100, 1_000, 10_000, 100_000]
+
+CLAIMS = {
+    "exp": 1767225600,
+    "iat": 1767225300,
+    "iss": "http://keycloak:8080/realms/platform-engine-realm",
+    "aud": "account",
+    "sub": "53535353-b670-4527-a34c-66523687b128",
+    "typ": "Bearer",
+    "azp": "client-web",
+    "scope": "openid profile email",
+    "realm_access": {"roles": ["offline_access", "uma_authorization", "default-roles"]},
+    "resource_access": {"account": {"roles": ["manage-account", "view-profile"]}},
+    "email_verified": True,
+    "name": "Jane Doe",
+    "preferred_username": "jane",
+    "email": "jane@example.com",
+}
+
+
+@dataclass(frozen=True, slots=True)
+class SlottedItemDTO:
+
+    id: str
+    name: str
+
+
+def measure(dumps, payload, min_time=0.2):
+    timer = timeit.Timer(lambda: dumps(payload))
+    loops, elapsed = timer.autorange()
+    while elapsed < min_time:
+        loops *= 2
+        elapsed = timer.timeit(loops)
+    tracemalloc.start()
+    dumps(payload)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed / loops, peak
+
+
+def run():
+    app = Flask(__name__)
+    providers = {"stdlib": StdlibJSONProvider(app)}
+    if orjson is not None:
+        providers["orjson"] = OrjsonProvider(app)
+    else:
+        print("orjson is not installed; only the stdlib provider is measured", file=sys.stderr)
+
+    results = []
+    cases = [("claims", 1, CLAIMS)]
+    for size in SIZES:
+        cases.append((f"items[{size}]", size, {"items": [ItemDTO(str(i), f"item-{i}") for i in range(size)]}))
+        cases.append((f"slotted_items[{size}]", size, {"items": [SlottedItemDTO(str(i), f"item-{i}") for i in range(size)]}))
+
+    for case, size, payload in cases:
+        for provider_name, provider in providers.items():
+            seconds, peak = measure(provider.dumps, payload)
+            results.append(
+                {
+                    "case": case,
+                    "provider": provider_name,
+                    "entries": size,
+                    "seconds_per_dump": seconds,
+                    "entries_per_second": size / seconds,
+                    "peak_alloc_bytes": peak,
+                }
+            )
+            print(
+                f"{case:<22} {provider_name:<7} {seconds * 1e6:>12.1f} us"
+                f" {size / seconds:>14,.0f} entries/s {peak / 1024:>10.1f} KiB peak"
+            )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = run()
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""In-memory server speaking enough of the Redis protocol (RESP2) for ``api.cache``.
+
+Supports PING, GET, SET (PX/EX/NX), PTTL, DEL, FLUSHDB, SELECT and CLIENT; other commands
+(including HELLO, so clients stay on RESP2) reply with an error. Used
+to exercise the shared cache tier without a Redis installation:
+
+    server = FakeRedis().start()
+    os.environ["CACHE_REDIS_URL"] = server.url
+"""
+
+import socketserver
+import threading
+import time
+
+
+class FakeRedis:
+    def __init__(self, host="127.0.0.1", port=0):
+        self.data = {}
+        self.commands = 0
+        self._lock = threading.Lock()
+        self._server = socketserver.ThreadingTCPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self.url = f"redis://{host}:{self._server.server_address[1]}/0"
+
+    def start(self):
+        thread = threading.Thread(target=self._server.serve_forever, name="fake-redis", daemon=True)
+        thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def execute(self, command, *args):
+        self.commands += 1
+        command = command.upper()
+        with self._lock:
+            if command == "PING":
+                return "PONG"
+            if command == "GET":
+                value = self._get(args[0])
+                return None if value is None else value.encode("latin-1")
+            if command == "SET":
+                return self._set(args)
+            if command == "PTTL":
+                if self._get(args[0]) is None:
+                    return -2
+                expires_at = self.data[args[0]][1]
+                return -1 if expires_at is None else int((expires_at - time.time()) * 1000)
+            if command == "DEL":
+                return sum(self.data.pop(key, None) is not None for key in args)
+            if command == "FLUSHDB":
+                self.data.clear()
+            if command in ("FLUSHDB", "SELECT", "CLIENT"):
+                return "OK"
+            return _Error(f"ERR unknown command '{command}'")
+
+    def _get(self, key):
+        entry = self.data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.time():
+            del self.data[key]
+            return None
+        return value
+
+    def _set(self, args):
+        key, value, options = args[0], args[1], [a.upper() for a in args[2:]]
+        expires_at = None
+        if "PX" in options:
+            expires_at = time.time() + int(args[2 + options.index("PX") + 1]) / 1000
+        elif "EX" in options:
+            expires_at = time.time() + int(args[2 + options.index("EX") + 1])
+        if "NX" in options and self._get(key) is not None:
+            return None
+        self.data[key] = (value, expires_at)
+        return "OK"
+
+    def _handler(self):
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            # Like Redis: pipelined replies are written one by one, and Nagle's algorithm
+            # would hold each later one back until the client's delayed ACK
+            disable_nagle_algorithm = True
+
+            def handle(self):
+                while True:
+                    request = self._read_command()
+                    if not request:
+                        return
+                    self.wfile.write(_encode(server.execute(*request)))
+
+            def _read_command(self):
+                line = self.rfile.readline()
+                if not line.startswith(b"*"):
+                    return None
+                parts = []
+                for _ in range(int(line[1:])):
+                    length = int(self.rfile.readline()[1:])
+                    parts.append(self.rfile.read(length + 2)[:-2])
+                # latin-1 maps bytes to str one to one, so values round-trip unchanged
+                return [part.decode("latin-1") for part in parts]
+
+        return Handler
+
+
+class _Error(str):
+    pass
+
+
+def _encode(value):
+    if isinstance(value, _Error):
+        return b"-%s\r\n" % value.encode("utf-8")
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, bytes):
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+    return b"+%s\r\n" % value.encode("utf-8")
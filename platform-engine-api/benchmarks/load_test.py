@@ -0,0 +1,318 @@
+"""Reproducible load test for the API against local Keycloak/Postgres stand-ins.
+
+Starts a stub JWKS issuer (see ``stub_issuer.py``), migrates and seeds users and items into
+SQLite or the Postgres given by ``--database-url`` (optionally read through a replica),
+serves ``api.app`` in-process (or targets an already running server with ``--target``) and
+drives ``/api/public``, ``/api/private``, the items route and ``/api/private`` with opaque
+(introspected) tokens at fixed concurrency levels. Latency percentiles and throughput are written to a JSON file;
+``--baseline`` compares against a previous run and exits non-zero on regressions.
+
+Usage:
+    poetry run python -m benchmarks.load_test --output bench.json
+    poetry run python -m benchmarks.load_test --baseline previous.json --tolerance 0.15
+
+With ``--target`` the server must trust the stub issuer: start it with
+``KEYCLOAK_SERVER_URL=http://127.0.0.1:<issuer-port>``, ``KEYCLOAK_REALM_NAME=benchmark-realm``,
+``INTROSPECTION_CLIENT_ID=api-introspection``, ``INTROSPECTION_CLIENT_SECRET=introspection-secret``
+and the same database URL, and pass the matching ``--issuer-port``.
+"""
+
+import argparse
+import http.client
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from sqlalchemy.engine import make_url
+
+from benchmarks.fake_redis import FakeRedis
+from benchmarks.stub_issuer import StubIssuer
+
+SCENARIOS = ("public", "private", "items", "opaque")
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def configure_environment(issuer, database_url, shared_cache_url=None, replica_url=None):
+    # Must happen before api.* is imported: settings are read at import time
+    if shared_cache_url:
+        os.environ["CACHE_REDIS_URL"] = shared_cache_url
+    if replica_url:
+        os.environ["SQLALCHEMY_REPLICA_URIS"] = replica_url
+    os.environ["KEYCLOAK_SERVER_URL"] = issuer.server_url
+    os.environ["KEYCLOAK_REALM_NAME"] = issuer.realm
+    os.environ["INTROSPECTION_CLIENT_ID"], os.environ["INTROSPECTION_CLIENT_SECRET"] = (
+        issuer.introspection_client
+    )
+    os.environ["SQLALCHEMY_DATABASE_URI"] = database_url
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("API_STARTUP_MODE", "eager")
+
+
+def seed(app, issuer, users, items_per_user):
+    from api.models import Item, db, verify_user
+
+    tokens = []
+    with app.app_context():
+        for index in range(users):
+            sub = f"bench-user-{index}"
+            token = issuer.mint(sub)
+            opaque_token = issuer.mint_opaque(sub)
+            owner_id = verify_user(issuer.claims_for(sub))
+            if not db.session.query(Item.id).filter(Item.owner_id == owner_id).first():
+                db.session.execute(
+                    Item.__table__.insert(),
+                    [{"owner_id": owner_id, "name": f"item-{n}"} for n in range(items_per_user)],
+                )
+                db.session.commit()
+            tokens.append((sub, token, opaque_token))
+    return tokens
+
+
+def serve(app):
+    from werkzeug.serving import make_server
+
+    # Per-request access logs would dominate the measurement
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="api-under-test", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def request_for(scenario, sub, token, opaque_token, page_size):
+    if scenario == "public":
+        return "/api/public", {}
+    if scenario == "opaque":
+        return "/api/private", {"Authorization": f"Bearer {opaque_token}"}
+    headers = {"Authorization": f"Bearer {token}"}
+    if scenario == "private":
+        return "/api/private", headers
+    return f"/api/users/{sub}/items?limit={page_size}", headers
+
+
+def run_worker(base_url, scenario, tokens, offset, deadline, page_size):
+    parts = urlsplit(base_url)
+    connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=30)
+    latencies, errors, index = [], 0, offset
+    while time.perf_counter() < deadline:
+        sub, token, opaque_token = tokens[index % len(tokens)]
+        index += 1
+        path, headers = request_for(scenario, sub, token, opaque_token, page_size)
+        started = time.perf_counter()
+        try:
+            connection.request("GET", path, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            ok = response.status == 200
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            ok = False
+        elapsed = time.perf_counter() - started
+        if ok:
+            latencies.append(elapsed)
+        else:
+            errors += 1
+    connection.close()
+    return latencies, errors
+
+
+def run_level(base_url, scenario, concurrency, tokens, duration, warmup, page_size):
+    if warmup:
+        run_level_once(base_url, scenario, concurrency, tokens, warmup, page_size)
+    latencies, errors, elapsed = run_level_once(
+        base_url, scenario, concurrency, tokens, duration, page_size
+    )
+    latencies.sort()
+    return {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "latency_ms": {
+            name: round(value * 1000, 3) if value is not None else None
+            for name, value in (
+                ("p50", percentile(latencies, 0.50)),
+                ("p95", percentile(latencies, 0.95)),
+                ("p99", percentile(latencies, 0.99)),
+                ("mean", sum(latencies) / len(latencies) if latencies else None),
+                ("max", latencies[-1] if latencies else None),
+            )
+        },
+    }
+
+
+def run_level_once(base_url, scenario, concurrency, tokens, duration, page_size):
+    started = time.perf_counter()
+    deadline = started + duration
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [
+            pool.submit(run_worker, base_url, scenario, tokens, worker, deadline, page_size)
+            for worker in range(concurrency)
+        ]
+        outcomes = [future.result() for future in futures]
+    elapsed = time.perf_counter() - started
+    latencies = [latency for worker_latencies, _ in outcomes for latency in worker_latencies]
+    return latencies, sum(errors for _, errors in outcomes), elapsed
+
+
+def compare(results, baseline, tolerance):
+    """Return human readable regressions of ``results`` against ``baseline``."""
+    previous = {(r["scenario"], r["concurrency"]): r for r in baseline["results"]}
+    regressions = []
+    for result in results:
+        before = previous.get((result["scenario"], result["concurrency"]))
+        if not before:
+            continue
+        label = f"{result['scenario']}@{result['concurrency']}"
+        p95, p95_before = result["latency_ms"]["p95"], before["latency_ms"]["p95"]
+        if p95 and p95_before and p95 > p95_before * (1 + tolerance):
+            regressions.append(f"{label}: p95 {p95_before}ms -> {p95}ms")
+        rps, rps_before = result["throughput_rps"], before["throughput_rps"]
+        if rps_before and rps < rps_before * (1 - tolerance):
+            regressions.append(f"{label}: throughput {rps_before} -> {rps} req/s")
+    return regressions
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the platform engine API.")
+    parser.add_argument("--database-url", help="Defaults to a temporary SQLite database")
+    parser.add_argument(
+        "--replica-database-url",
+        help="Read replica of the database, or 'copy' for a snapshot of the seeded SQLite one",
+    )
+    parser.add_argument("--target", help="Base URL of an already running API")
+    parser.add_argument("--issuer-port", type=int, default=0)
+    parser.add_argument(
+        "--shared-cache", help="Redis URL for the shared cache tier, or 'fake' for an in-memory one"
+    )
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--concurrency", default="1,8,32", help="Comma separated levels")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per level")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Seconds before each level")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--items-per-user", type=int, default=200)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", help="Previous results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    issuer = StubIssuer(port=args.issuer_port).start()
+    database_url = args.database_url or (
+        f"sqlite:///{tempfile.mkdtemp(prefix='api-bench-')}/bench.sqlite"
+    )
+    replica_url = args.replica_database_url
+    if replica_url == "copy":
+        if not database_url.startswith("sqlite:///"):
+            parser.error("--replica-database-url copy needs a SQLite database")
+        replica_url = database_url.replace(".sqlite", "-replica.sqlite")
+    fake_redis = FakeRedis().start() if args.shared_cache == "fake" else None
+    shared_cache_url = fake_redis.url if fake_redis else args.shared_cache
+    configure_environment(issuer, database_url, shared_cache_url, replica_url)
+
+    from api.migrate import upgrade
+
+    # Before api.app is imported: that creates the module level app and warms it up
+    upgrade(database_url)
+    from api.app import create_app
+
+    app = create_app()
+    tokens = seed(app, issuer, args.users, args.items_per_user)
+    if args.replica_database_url == "copy":
+        from api.replicas import recent_writers
+
+        # The replica's engine connects lazily, so it first opens the finished snapshot.
+        # The snapshot has every seeded write: no read needs to stay on the primary
+        shutil.copyfile(make_url(database_url).database, make_url(replica_url).database)
+        recent_writers.clear()
+    server = None
+    if args.target:
+        base_url = args.target.rstrip("/")
+    else:
+        server, base_url = serve(app)
+
+    results = []
+    try:
+        for scenario in args.scenarios.split(","):
+            for concurrency in (int(level) for level in args.concurrency.split(",")):
+                result = run_level(
+                    base_url,
+                    scenario,
+                    concurrency,
+                    tokens,
+                    args.duration,
+                    args.warmup,
+                    args.page_size,
+                )
+                results.append(result)
+                latency = result["latency_ms"]
+                print(
+                    f"{scenario:<8} c={concurrency:<4} {result['throughput_rps']:>10.1f} req/s"
+                    f"  p50={latency['p50']}ms p95={latency['p95']}ms p99={latency['p99']}ms"
+                    f"  errors={result['errors']}"
+                )
+    finally:
+        if server:
+            server.shutdown()
+        issuer.stop()
+        if fake_redis:
+            fake_redis.stop()
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "database": database_url.split("://", 1)[0],
+            "target": args.target or "in-process werkzeug",
+            "shared_cache": args.shared_cache,
+            "replica": replica_url.split("://", 1)[0] if replica_url else None,
+            "jwks_requests": issuer.jwks_requests,
+            "introspection_requests": issuer.introspection_requests,
+            "duration_s": args.duration,
+            "users": args.users,
+            "items_per_user": args.items_per_user,
+            "page_size": args.page_size,
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
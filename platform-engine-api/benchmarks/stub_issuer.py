@@ -0,0 +1,129 @@
+"""Local stand-in for the Keycloak realm endpoints the API talks to.
+
+Serves the realm JWKS at ``/realms/<realm>/protocol/openid-connect/certs`` and mints RS256
+access tokens signed with the matching private key, so the API can be exercised without
+a running Keycloak. Opaque tokens from ``mint_opaque`` are answered by the RFC 7662
+introspection endpoint at ``.../openid-connect/token/introspect``.
+"""
+
+import base64
+import json
+import secrets
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+from authlib.jose import JsonWebKey, jwt
+
+
+class StubIssuer:
+    def __init__(
+        self,
+        realm="benchmark-realm",
+        host="127.0.0.1",
+        port=0,
+        azp="client-web",
+        introspection_client=("api-introspection", "introspection-secret"),
+    ):
+        self.realm = realm
+        self.azp = azp
+        self.introspection_client = introspection_client
+        self.opaque_tokens = {}
+        self.introspection_requests = 0
+        self.kid = uuid.uuid4().hex
+        self.key = JsonWebKey.generate_key("RSA", 2048, is_private=True)
+        public_jwk = self.key.as_dict(is_private=False)
+        public_jwk.update(kid=self.kid, use="sig", alg="RS256")
+        self.jwks = json.dumps({"keys": [public_jwk]}).encode("utf-8")
+        self.jwks_requests = 0
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self.server_url = f"http://{host}:{self._server.server_port}"
+        self.issuer = f"{self.server_url}/realms/{realm}"
+
+    def _handler(self):
+        issuer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                if self.path != f"/realms/{issuer.realm}/protocol/openid-connect/token/introspect":
+                    self.send_error(404)
+                    return
+                form = parse_qs(self.rfile.read(int(self.headers["Content-Length"])).decode())
+                issuer.introspection_requests += 1
+                if self.headers.get("Authorization") != issuer.introspection_authorization():
+                    self._reply(401, {"error": "invalid_client"})
+                    return
+                claims = issuer.opaque_tokens.get(form.get("token", [""])[0])
+                if claims is None or claims["exp"] <= time.time():
+                    self._reply(200, {"active": False})
+                    return
+                self._reply(200, {"active": True, **claims})
+
+            def _reply(self, status, payload):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path != f"/realms/{issuer.realm}/protocol/openid-connect/certs":
+                    self.send_error(404)
+                    return
+                issuer.jwks_requests += 1
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Cache-Control", "max-age=300")
+                self.send_header("Content-Length", str(len(issuer.jwks)))
+                self.end_headers()
+                self.wfile.write(issuer.jwks)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        thread = threading.Thread(target=self._server.serve_forever, name="stub-issuer", daemon=True)
+        thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def claims_for(self, sub, lifetime=3600):
+        now = int(time.time())
+        return {
+            "iss": self.issuer,
+            "sub": sub,
+            "azp": self.azp,
+            "typ": "Bearer",
+            "iat": now,
+            "exp": now + lifetime,
+            "email": f"{sub}@benchmark.local",
+            "name": f"Benchmark {sub}",
+            "preferred_username": sub,
+            "scope": "openid profile email",
+        }
+
+    def introspection_authorization(self):
+        credentials = ":".join(self.introspection_client).encode("utf-8")
+        return "Basic " + base64.b64encode(credentials).decode("ascii")
+
+    def mint_opaque(self, sub, lifetime=3600, **claims):
+        """An opaque token that only the introspection endpoint can resolve."""
+        token = secrets.token_urlsafe(32)
+        self.opaque_tokens[token] = {**self.claims_for(sub, lifetime), **claims}
+        return token
+
+    def mint(self, sub, lifetime=3600, **claims):
+        payload = self.claims_for(sub, lifetime)
+        payload.update(claims)
+        header = {"alg": "RS256", "kid": self.kid, "typ": "JWT"}
+        return jwt.encode(header, payload, self.key).decode("ascii")
@@ -0,0 +1,49 @@
+"""Gunicorn settings for serving ``api.wsgi:app``; every value can be overridden by env.
+
+    poetry run gunicorn -c gunicorn.conf.py api.wsgi:app
+"""
+
+import multiprocessing
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:4000")
+# One process per core (plus one) so CPU-bound work such as JWT verification scales out
+workers = int(os.getenv("GUNICORN_WORKERS", str(multiprocessing.cpu_count() + 1)))
+# gthread: threads share a worker's caches and DB pool. "gevent" needs gevent installed
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "1000"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+# Recycle workers periodically; the jitter keeps them from all restarting at once
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "10000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "1000"))
+# Import the app (and warm it up) once in the master, then fork the workers from it
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() == "true"
+accesslog = os.getenv("GUNICORN_ACCESS_LOG") or None
+errorlog = "-"
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
+
+
+def when_ready(server):
+    if not preload_app:
+        return
+    from api.models import db
+    from api.wsgi import app, warm_up
+
+    if not warm_up(app):
+        server.log.warning("Warm-up failed in the master; workers will retry on demand")
+    with app.app_context():
+        # Connections must not be shared across the fork
+        db.engine.dispose()
+
+
+def post_fork(server, worker):
+    if not preload_app:
+        return
+    from api.models import db
+    from api.wsgi import app
+
+    with app.app_context():
+        db.engine.dispose(close=False)
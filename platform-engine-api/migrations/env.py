@@ -0,0 +1,41 @@
+import logging.config
+
+from alembic import context
+from sqlalchemy import create_engine, pool, text
+
+from api.migrate import DATABASE_URI
+from api.models import db
+
+config = context.config
+if config.config_file_name is not None:
+    logging.config.fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = db.metadata
+database_uri = config.attributes.get("database_uri", DATABASE_URI)
+
+# Serializes concurrent 'python -m api.migrate' runs on PostgreSQL (e.g. two deploys)
+MIGRATION_LOCK_ID = 4_241_019
+
+
+def run_migrations_online():
+    engine = create_engine(database_uri, poolclass=pool.NullPool)
+    with engine.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            # SQLite cannot ALTER constraints; batch operations recreate the table instead
+            render_as_batch=connection.dialect.name == "sqlite",
+        )
+        with context.begin_transaction():
+            if connection.dialect.name == "postgresql":
+                connection.execute(
+                    text("SELECT pg_advisory_xact_lock(:id)"), {"id": MIGRATION_LOCK_ID}
+                )
+            context.run_migrations()
+    engine.dispose()
+
+
+if context.is_offline_mode():
+    # Revisions inspect the live schema so they can adopt databases built by create_all
+    raise SystemExit("Offline (--sql) migrations are not supported")
+run_migrations_online()
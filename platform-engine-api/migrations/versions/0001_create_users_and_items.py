@@ -0,0 +1,40 @@
+"""Create the users and items tables
+
+The tables as the API first created them with ``db.create_all()``. Databases created that
+way already have them and are adopted by this revision as they are.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 15:00:00
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+    if "users" not in existing:
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+            sa.Column("name", sa.String()),
+            sa.Column("username", sa.String()),
+            sa.Column("email", sa.String()),
+        )
+    if "items" not in existing:
+        op.create_table(
+            "items",
+            sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+            sa.Column("name", sa.String()),
+        )
+
+
+def downgrade():
+    op.drop_table("items")
+    op.drop_table("users")
@@ -0,0 +1,42 @@
+"""Unique user emails, item owners and the keyset pagination index
+
+Fails rather than guessing when ``users`` holds duplicate emails or ``items`` holds rows
+without an owner; resolve those by hand and run the migration again.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 15:00:01
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    # Schemas created by create_all after these were added to the models already have them
+    if "ix_users_email" not in {index["name"] for index in inspector.get_indexes("users")}:
+        op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    if "owner_id" not in {column["name"] for column in inspector.get_columns("items")}:
+        with op.batch_alter_table("items") as batch_op:
+            batch_op.add_column(sa.Column("owner_id", sa.Integer(), nullable=True))
+            batch_op.create_foreign_key(
+                "items_owner_id_fkey", "users", ["owner_id"], ["id"], ondelete="CASCADE"
+            )
+            batch_op.alter_column("owner_id", existing_type=sa.Integer(), nullable=False)
+    if "ix_items_owner_id_id" not in {index["name"] for index in inspector.get_indexes("items")}:
+        op.create_index("ix_items_owner_id_id", "items", ["owner_id", "id"])
+
+
+def downgrade():
+    op.drop_index("ix_items_owner_id_id", table_name="items")
+    with op.batch_alter_table("items") as batch_op:
+        batch_op.drop_constraint("items_owner_id_fkey", type_="foreignkey")
+        batch_op.drop_column("owner_id")
+    op.drop_index("ix_users_email", table_name="users")
@@ -0,0 +1,31 @@
+"""Track a version of each user's items for ETags
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 15:00:02
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    columns = {column["name"] for column in sa.inspect(op.get_bind()).get_columns("users")}
+    with op.batch_alter_table("users") as batch_op:
+        if "items_version" not in columns:
+            batch_op.add_column(
+                sa.Column("items_version", sa.Integer(), nullable=False, server_default="0")
+            )
+        if "items_modified_at" not in columns:
+            batch_op.add_column(sa.Column("items_modified_at", sa.DateTime(timezone=True)))
+
+
+def downgrade():
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.drop_column("items_modified_at")
+        batch_op.drop_column("items_version")
@@ -0,0 +1,42 @@
+"""Key users by their Keycloak subject
+
+Adds ``users.sub`` with a unique index and makes ``ix_users_email`` an ordinary index.
+Existing rows keep a NULL ``sub`` until their user next signs in, when ``verify_user``
+claims the row by email.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 15:00:03
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if "sub" not in {column["name"] for column in inspector.get_columns("users")}:
+        with op.batch_alter_table("users") as batch_op:
+            batch_op.add_column(sa.Column("sub", sa.String()))
+    indexes = {index["name"]: index for index in inspector.get_indexes("users")}
+    if "ix_users_sub" not in indexes:
+        op.create_index("ix_users_sub", "users", ["sub"], unique=True)
+    email_index = indexes.get("ix_users_email")
+    if email_index is None or email_index["unique"]:
+        if email_index is not None:
+            op.drop_index("ix_users_email", table_name="users")
+        op.create_index("ix_users_email", "users", ["email"])
+
+
+def downgrade():
+    # Fails if two subjects now share an email
+    op.drop_index("ix_users_email", table_name="users")
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+    op.drop_index("ix_users_sub", table_name="users")
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.drop_column("sub")
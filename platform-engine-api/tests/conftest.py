@@ -0,0 +1,37 @@
+import pytest
+
+from benchmarks.fake_redis import FakeRedis
+from benchmarks.stub_issuer import StubIssuer
+
+
+@pytest.fixture
+def fake_redis():
+    server = FakeRedis().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def redis_client(fake_redis):
+    # redis-py comes with the shared-cache extra
+    redis = pytest.importorskip("redis")
+    from redis.backoff import NoBackoff
+    from redis.retry import Retry
+
+    # Configured like api.cache.shared_client
+    client = redis.Redis.from_url(
+        fake_redis.url,
+        protocol=2,
+        socket_timeout=0.25,
+        socket_connect_timeout=0.25,
+        retry=Retry(NoBackoff(), 0),
+    )
+    yield client
+    client.close()
+
+
+@pytest.fixture
+def issuer():
+    stub = StubIssuer().start()
+    yield stub
+    stub.stop()
@@ -0,0 +1,186 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from api import cache
+from api.cache import LRUCache, SharedTier, TieredCache, run_off_loop
+
+
+def tiered(client, ttl=None, prefix="test:"):
+    return TieredCache(LRUCache(maxsize=16, ttl=ttl), SharedTier(client, prefix))
+
+
+def test_local_hit_skips_the_shared_tier(fake_redis, redis_client):
+    tokens = tiered(redis_client)
+    tokens.set("a", {"sub": "alice"})
+    commands = fake_redis.commands
+
+    assert tokens.get("a") == {"sub": "alice"}
+    assert fake_redis.commands == commands
+
+
+def test_shared_hit_fills_the_local_tier(fake_redis, redis_client):
+    tiered(redis_client).set("a", {"sub": "alice"}, expires_at=time.time() + 60)
+    other_worker = tiered(redis_client)
+
+    assert other_worker.get("a") == {"sub": "alice"}
+    commands = fake_redis.commands
+    assert other_worker.get("a") == {"sub": "alice"}
+    assert fake_redis.commands == commands
+    assert other_worker.stats()["shared_hits"] == 1
+
+
+def test_expiry_carries_across_tiers(fake_redis, redis_client):
+    tiered(redis_client).set("a", "value", expires_at=time.time() + 0.3)
+    other_worker = tiered(redis_client)
+    assert other_worker.get("a") == "value"
+
+    time.sleep(0.4)
+    # Expired in the local tier, which got its expiry from PTTL, and in the shared one
+    assert other_worker.get("a") is None
+    assert "test:a" not in fake_redis.data
+
+
+def test_cache_ttl_applies_to_the_shared_tier(fake_redis, redis_client):
+    tiered(redis_client, ttl=30).set("a", "value")
+
+    pttl = redis_client.pttl("test:a")
+    assert 29_000 < pttl <= 30_000
+
+
+def test_expired_values_are_not_shared(fake_redis, redis_client):
+    tiered(redis_client).set("a", "value", expires_at=time.time() - 1)
+
+    assert "test:a" not in fake_redis.data
+
+
+def test_unavailable_shared_tier_is_a_miss_and_backs_off(fake_redis, redis_client, monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_SHARED_RETRY_INTERVAL", 0.3)
+    tokens = tiered(redis_client)
+    fake_redis.stop()
+
+    tokens.set("a", "value")
+    assert tokens.get("a") == "value"
+    assert tokens.get("b") is None
+    assert tokens.get("c") is None
+    # One failure, then the tier is skipped until the retry interval has passed
+    assert tokens.stats()["shared_errors"] == 1
+
+    time.sleep(0.4)
+    assert tokens.get("b") is None
+    assert tokens.stats()["shared_errors"] == 2
+
+
+def test_local_tier_alone():
+    users = TieredCache(LRUCache(maxsize=16))
+    users.set("a", 1)
+
+    assert users.get("a") == 1
+    assert users.get("b", "default") == "default"
+    assert users.stats()["shared"] is False
+
+
+def test_get_or_set_is_single_flight(redis_client):
+    tokens = tiered(redis_client)
+    waiters = 8
+    release = threading.Event()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        release.wait(5)
+        return "loaded"
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(tokens.get_or_set("a", loader)))
+        for _ in range(waiters)
+    ]
+    for thread in threads:
+        thread.start()
+    # Every caller has either become the leader or joined its flight
+    deadline = time.monotonic() + 5
+    while len(calls) + tokens.coalesced < waiters and time.monotonic() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert results == ["loaded"] * waiters
+    assert len(calls) == 1
+    assert tokens.stats()["coalesced"] == waiters - 1
+    assert redis_client.get("test:a") == b'"loaded"'
+
+
+def test_get_or_set_shares_the_loader_error(redis_client):
+    tokens = tiered(redis_client)
+    release = threading.Event()
+
+    def loader():
+        release.wait(5)
+        raise RuntimeError("loader failed")
+
+    errors = []
+
+    def lookup():
+        try:
+            tokens.get_or_set("a", loader)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=lookup) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while tokens.coalesced < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert errors == ["loader failed"] * 4
+    assert tokens.get("a") is None
+
+
+def test_get_or_set_does_not_cache_none(redis_client):
+    tokens = tiered(redis_client)
+
+    assert tokens.get_or_set("a", lambda: None) is None
+    assert tokens.get_or_set("a", lambda: "later") == "later"
+
+
+def test_get_or_set_expiry_from_the_value(redis_client):
+    tokens = tiered(redis_client)
+    exp = time.time() + 60
+
+    tokens.get_or_set("a", lambda: {"exp": exp}, expires_at=lambda claims: claims["exp"])
+
+    assert 59_000 < redis_client.pttl("test:a") <= 60_000
+
+
+def test_hit_ratio_counts_shared_hits_as_hits(redis_client):
+    tiered(redis_client).set("shared", "value")
+    tokens = tiered(redis_client)
+    tokens.set("local", "value")
+
+    tokens.get("local")
+    tokens.get("shared")
+    tokens.get("missing")
+
+    stats = tokens.stats()
+    assert stats["local_hits"] == 1
+    assert stats["shared_hits"] == 1
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+    assert stats["hit_ratio"] == pytest.approx(0.6667)
+
+
+def test_run_off_loop_uses_a_thread_only_for_the_shared_tier(redis_client):
+    async def lookup(tokens):
+        return await run_off_loop(tokens, lambda: threading.current_thread())
+
+    loop_thread = threading.current_thread()
+    assert asyncio.run(lookup(TieredCache(LRUCache()))) is loop_thread
+    assert asyncio.run(lookup(tiered(redis_client))) is not loop_thread
@@ -0,0 +1,68 @@
+import io
+
+import pytest
+from flask import Flask
+from werkzeug.wsgi import LimitedStream
+
+from api.ingest import iter_csv, iter_ndjson
+from api.json_provider import get_json_provider_class
+
+
+@pytest.fixture(autouse=True)
+def app_context():
+    app = Flask(__name__)
+    app.json = get_json_provider_class()(app)
+    with app.app_context():
+        yield
+
+
+def body(data):
+    # As request.stream hands it to the route
+    return LimitedStream(io.BytesIO(data), len(data))
+
+
+def rejects(rows):
+    return [(line_no, error.split(":")[0]) for line_no, _, error in rows if error]
+
+
+def test_ndjson_rejects_invalid_utf8_by_line():
+    rows = list(iter_ndjson(body(b'{"name":"a"}\n{"name":"b\xff"}\n\n{"name":"c"}\n')))
+
+    assert [(line_no, row) for line_no, row, _ in rows if row] == [
+        (1, {"name": "a"}),
+        (4, {"name": "c"}),
+    ]
+    assert rejects(rows) == [(2, "Invalid UTF-8")]
+
+
+def test_ndjson_rejects_invalid_utf8_on_the_last_line():
+    assert rejects(iter_ndjson(body(b'{"name":"a"}\n\xff'))) == [(2, "Invalid UTF-8")]
+
+
+def test_csv_rejects_invalid_utf8_and_keeps_going():
+    rows = list(iter_csv(body(b'name\r\na\r\nb\xff\r\n"m\r\nn"\r\nc\r\n')))
+
+    assert [(line_no, row["name"]) for line_no, row, _ in rows if row] == [
+        (2, "a"),
+        (5, "m\r\nn"),
+        (6, "c"),
+    ]
+    assert rejects(rows) == [(3, "Invalid UTF-8")]
+
+
+def test_csv_rejects_an_unterminated_quote():
+    rows = list(iter_csv(body(b'name\na\n"z\n')))
+
+    assert [row for _, row, _ in rows if row] == [{"name": "a"}]
+    assert rejects(rows) == [(3, "Invalid CSV")]
+
+
+def test_csv_rejects_an_oversized_field_and_resumes():
+    rows = list(iter_csv(body(b"name\n" + b"x" * 200_000 + b"\nok\n")))
+
+    assert rejects(rows) == [(2, "Invalid CSV")]
+    assert rows[-1] == (3, {"name": "ok"}, None)
+
+
+def test_csv_with_an_unreadable_header_stops():
+    assert rejects(iter_csv(body(b"na\xffme\na\n"))) == [(1, "Invalid CSV header")]
@@ -0,0 +1,200 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from api import introspection
+from api.auth import ClientCredsTokenValidator
+from api.cache import LRUCache, SharedTier, TieredCache
+from api.introspection import TokenIntrospector
+
+
+def make_introspector(issuer):
+    return TokenIntrospector(
+        f"{issuer.issuer}/protocol/openid-connect/token/introspect",
+        *issuer.introspection_client,
+        cache=TieredCache(LRUCache(maxsize=16)),
+    )
+
+
+@pytest.fixture
+def introspector(issuer):
+    return make_introspector(issuer)
+
+
+@pytest.fixture
+def validator(issuer, introspector):
+    validator = ClientCredsTokenValidator(issuer.issuer)
+    validator.introspector = introspector
+    return validator
+
+
+def introspect(introspector, token):
+    return introspector.introspect(token, f"key-{token}")
+
+
+def test_active_token_is_cached_until_exp(issuer, introspector):
+    token = issuer.mint_opaque("alice")
+
+    first = introspect(introspector, token)
+    second = introspect(introspector, token)
+
+    assert first["active"] is True and first["sub"] == "alice"
+    assert second == first
+    assert issuer.introspection_requests == 1
+
+
+def test_expired_token_is_introspected_again(issuer, introspector):
+    token = issuer.mint_opaque("alice", lifetime=1)
+    exp = introspect(introspector, token)["exp"]
+
+    time.sleep(max(exp - time.time(), 0) + 0.05)
+
+    assert introspect(introspector, token) == {"active": False}
+    assert issuer.introspection_requests == 2
+
+
+def test_inactive_token_is_cached_for_the_negative_ttl(issuer, introspector, monkeypatch):
+    monkeypatch.setattr(introspection, "INTROSPECTION_NEGATIVE_TTL", 0.3)
+
+    assert introspect(introspector, "unknown") == {"active": False}
+    assert introspect(introspector, "unknown") == {"active": False}
+    assert issuer.introspection_requests == 1
+
+    time.sleep(0.4)
+    assert introspect(introspector, "unknown") == {"active": False}
+    assert issuer.introspection_requests == 2
+
+
+def test_concurrent_lookups_share_one_call(issuer, introspector):
+    token = issuer.mint_opaque("alice")
+    callers = 8
+    start = threading.Barrier(callers)
+    results = []
+
+    def lookup():
+        start.wait(5)
+        results.append(introspect(introspector, token))
+
+    threads = [threading.Thread(target=lookup) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(results) == callers
+    assert all(result["sub"] == "alice" for result in results)
+    assert issuer.introspection_requests == 1
+    assert introspector.calls == 1
+
+
+def test_distinct_tokens_are_looked_up_in_parallel(issuer, introspector):
+    tokens = [issuer.mint_opaque(f"user-{n}") for n in range(5)]
+
+    futures = [introspector.submit(token, f"key-{token}") for token in tokens]
+
+    assert [future.result(5)["sub"] for future in futures] == [f"user-{n}" for n in range(5)]
+    assert introspector.calls == 5
+
+
+def test_slow_lookup_does_not_hold_up_the_others(issuer, introspector, monkeypatch):
+    slow, fast = issuer.mint_opaque("slow"), issuer.mint_opaque("fast")
+    call = introspector._call
+    started, release = threading.Event(), threading.Event()
+
+    def delayed_call(token_string):
+        if token_string == slow:
+            started.set()
+            release.wait(5)
+        return call(token_string)
+
+    monkeypatch.setattr(introspector, "_call", delayed_call)
+    slow_lookup = introspector.submit(slow, "key-slow")
+    assert started.wait(5)
+
+    assert introspect(introspector, fast)["sub"] == "fast"
+    assert not slow_lookup.done()
+    release.set()
+    assert slow_lookup.result(5)["sub"] == "slow"
+
+
+def test_unreachable_endpoint_is_a_failed_lookup(issuer, introspector):
+    token = issuer.mint_opaque("alice")
+    issuer.stop()
+
+    assert introspect(introspector, token) is None
+    # Failures are not cached
+    assert introspector.cached(f"key-{token}") is None
+
+
+def test_introspected_claims_go_into_the_token_cache(issuer, validator):
+    token = issuer.mint_opaque("alice")
+
+    claims = validator.authenticate_token(token)
+    assert claims["sub"] == "alice"
+    lookups = validator.introspector.stats()
+
+    assert validator.authenticate_token(token)["sub"] == "alice"
+    # Answered by the token cache, without going through the introspector again
+    assert validator.introspector.stats() == lookups
+    assert validator.token_cache.stats()["hits"] == 1
+    assert issuer.introspection_requests == 1
+
+
+def test_token_cache_hit_skips_the_shared_tier(issuer, validator, fake_redis, redis_client):
+    validator.token_cache = TieredCache(
+        LRUCache(maxsize=16),
+        SharedTier(redis_client, "token:", validator._dump_claims, validator._load_claims),
+    )
+    token = issuer.mint_opaque("alice")
+    validator.authenticate_token(token)
+    commands = fake_redis.commands
+
+    assert validator.authenticate_token(token)["sub"] == "alice"
+    assert fake_redis.commands == commands
+
+    # Another worker gets the introspected claims from the shared tier
+    other = ClientCredsTokenValidator(issuer.issuer)
+    other.introspector = make_introspector(issuer)
+    other.token_cache = TieredCache(
+        LRUCache(maxsize=16),
+        SharedTier(redis_client, "token:", other._dump_claims, other._load_claims),
+    )
+    assert other.authenticate_token(token)["sub"] == "alice"
+    assert issuer.introspection_requests == 1
+
+
+def test_inactive_and_foreign_tokens_are_rejected(issuer, validator):
+    assert validator.authenticate_token("unknown") is None
+    foreign = issuer.mint_opaque("alice", iss="https://elsewhere.example/realms/other")
+    assert validator.authenticate_token(foreign) is None
+    assert validator.token_cache.stats()["size"] == 0
+
+
+def test_new_jwt_is_one_token_cache_lookup(issuer, validator):
+    token = issuer.mint("alice")
+
+    assert validator.authenticate_token(token)["sub"] == "alice"
+    assert validator.token_cache.stats()["misses"] == 1
+    assert validator.authenticate_token(token)["sub"] == "alice"
+    stats = validator.token_cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+    assert issuer.introspection_requests == 0
+
+
+def test_async_validator_looks_up_a_new_jwt_once(issuer, validator):
+    pytest.importorskip("quart")
+    from api.async_auth import AsyncTokenValidator
+
+    validator.jwks.load()
+    async_validator = AsyncTokenValidator(validator)
+    token, opaque = issuer.mint("alice"), issuer.mint_opaque("bob")
+
+    assert asyncio.run(async_validator.authenticate_token(token))["sub"] == "alice"
+    assert validator.token_cache.stats()["misses"] == 1
+    assert asyncio.run(async_validator.authenticate_token(opaque))["sub"] == "bob"
+    assert asyncio.run(async_validator.authenticate_token(opaque))["sub"] == "bob"
+    stats = validator.token_cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 2)
+    assert issuer.introspection_requests == 1
@@ -0,0 +1,87 @@
+import pytest
+from flask import Flask
+from sqlalchemy import create_engine, insert, select
+
+from api.migrate import upgrade
+from api.models import Item, User, db, user_cache, verify_user
+
+
+@pytest.fixture
+def database_url(tmp_path):
+    return f"sqlite:///{tmp_path}/users.sqlite"
+
+
+@pytest.fixture
+def app(database_url):
+    upgrade(database_url)
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = database_url
+    db.init_app(app)
+    user_cache.clear()
+    with app.app_context():
+        yield app
+    user_cache.clear()
+
+
+def token(sub, email, **claims):
+    return {"sub": sub, "email": email, **claims}
+
+
+def test_user_is_keyed_by_sub(app):
+    user_id = verify_user(token("alice", "alice@example.com"))
+    user_cache.clear()
+
+    assert verify_user(token("alice", "alice@example.com", name="Alice")) == user_id
+    assert db.session.get(User, user_id).name == "Alice"
+
+
+def test_changed_email_keeps_the_user(app):
+    user_id = verify_user(token("alice", "alice@example.com"))
+    user_cache.clear()
+
+    assert verify_user(token("alice", "alice@example.org")) == user_id
+    assert db.session.get(User, user_id).email == "alice@example.org"
+
+
+def test_subjects_sharing_an_email_are_separate_users(app):
+    alice = verify_user(token("alice", "shared@example.com"))
+    mallory = verify_user(token("mallory", "shared@example.com"))
+
+    assert alice != mallory
+
+
+def test_token_without_email_keeps_the_stored_one(app):
+    user_id = verify_user(token("alice", "alice@example.com"))
+    user_cache.clear()
+
+    assert verify_user({"sub": "alice"}) == user_id
+    assert db.session.get(User, user_id).email == "alice@example.com"
+
+
+def test_token_without_sub_is_rejected(app):
+    assert verify_user({"email": "alice@example.com"}) is None
+
+
+def test_user_from_before_0004_is_claimed_by_email(database_url):
+    upgrade(database_url, "0003")
+    engine = create_engine(database_url)
+    with engine.begin() as connection:
+        legacy_id = connection.execute(
+            insert(User.__table__)
+            .values(email="alice@example.com", items_version=0)
+            .returning(User.id)
+        ).scalar_one()
+        connection.execute(insert(Item.__table__).values(owner_id=legacy_id, name="kept"))
+    engine.dispose()
+
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = database_url
+    db.init_app(app)
+    upgrade(database_url)
+    user_cache.clear()
+    with app.app_context():
+        assert verify_user(token("alice", "alice@example.com")) == legacy_id
+        assert db.session.execute(select(User.sub).where(User.id == legacy_id)).scalar() == "alice"
+        # Claimed once; another subject with the address gets a user of its own
+        assert verify_user(token("mallory", "alice@example.com")) != legacy_id
+    user_cache.clear()